@@ -15,34 +15,54 @@ print_message () {
 }
 
 
+REPORT_DIR=$(mktemp -d)
+trap 'rm -rf "$REPORT_DIR"' EXIT
+
+# Both projects run at the same time, so each gets half of the cores
+# for its pytest-xdist workers. Override with PYTEST_WORKERS.
+CORES=$(nproc 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null || echo 2)
+WORKERS=${PYTEST_WORKERS:-$(( CORES > 1 ? CORES / 2 : 1 ))}
+
+run_suite () {
+    # Run the pytest suite of the project (first argument) with the settings
+    # module (second argument) and save its output to the project log.
+    (
+        cd "$1" &&
+        DJANGO_SETTINGS_MODULE="$2" pytest --tb=line -n "$WORKERS" \
+            --views-report="$REPORT_DIR/$1.json"
+    ) > "$REPORT_DIR/$1.log" 2>&1
+}
+
+
 if python -m flake8 --config=setup.cfg 1>&2;
 then
     print_message " flake8 завершил проверку кода, ошибок не обнаружено " "="
     echo $LF 1>&2
     if python structure_test.py
     then
-        cd ya_news
-        export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanews.settings"}"
-        if pytest --tb=line 1>&2;
+        run_suite ya_news "${DJANGO_SETTINGS_MODULE:-yanews.settings}" &
+        news_pid=$!
+        run_suite ya_note yanote.settings &
+        note_pid=$!
+        wait $news_pid
+        news_status=$?
+        wait $note_pid
+        note_status=$?
+        cat "$REPORT_DIR/ya_news.log" "$REPORT_DIR/ya_note.log" 1>&2
+        if [[ $news_status -ne 0 ]];
         then
-            cd ../ya_note
-            unset DJANGO_SETTINGS_MODULE
-            export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanote.settings"}"
-            if pytest --tb=line 1>&2;
-            then
-                exit 0
-            else
-                status=$?
-                print_message " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта " "=" 1
-                echo \`\`\` 1>&2
-                exit $status
-            fi
-        else
-            status=$?
             print_message " При запуске упали ваши тесты для проекта YaNews. Проверьте тесты этого проекта " "=" 1
             echo \`\`\` 1>&2
-            exit $status
+            exit $news_status
+        elif [[ $note_status -ne 0 ]];
+        then
+            print_message " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта " "=" 1
+            echo \`\`\` 1>&2
+            exit $note_status
         fi
+        print_message " Самые медленные представления " "="
+        python slowest_views.py "$REPORT_DIR"/*.json
+        exit 0
     else
         status=$?
         print_message " Убедитесь, что написанные вами тесты скопированы в указанные в ТЗ директории " "=" 1
@@ -0,0 +1,31 @@
+"""Сводная таблица самых медленных представлений из отчётов pytest."""
+import json
+import sys
+from pathlib import Path
+
+LIMIT = 10
+
+
+def main(paths):
+    rows = []
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            rows += [
+                (Path(path).stem, name, stats)
+                for name, stats in json.load(file).items()
+                if stats['count']
+            ]
+    rows.sort(key=lambda row: row[2]['p95'], reverse=True)
+    print(
+        f'{"проект":<10}{"представление":<24}{"вызовов":>10}'
+        f'{"p50, мс":>10}{"p95, мс":>10}{"max, мс":>10}'
+    )
+    for project, name, stats in rows[:LIMIT]:
+        print(
+            f'{project:<10}{name:<24}{stats["count"]:>10}'
+            f'{stats["p50"]:>10.1f}{stats["p95"]:>10.1f}{stats["max"]:>10.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
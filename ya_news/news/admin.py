@@ -1,15 +1,44 @@
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
 
 from .models import Comment, News
+from .sharding import count_comments, shard_for_news
+
+
+class CommentInlineFormSet(BaseInlineFormSet):
+    """Комментарии новости читаются из её шарда."""
+
+    def __init__(self, *args, instance=None, queryset=None, **kwargs):
+        if instance is not None and instance.pk and queryset is not None:
+            alias = shard_for_news(instance.pk)
+            if alias is not None:
+                queryset = queryset.using(alias)
+        super().__init__(
+            *args, instance=instance, queryset=queryset, **kwargs
+        )
 
 
 class CommentInline(admin.StackedInline):
     model = Comment
+    formset = CommentInlineFormSet
     extra = 0
 
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
+    list_display = ('title', 'date', 'comment_count', 'stored_comments')
     inlines = [
         CommentInline,
     ]
+
+    def get_changelist_instance(self, request):
+        """Число комментариев страницы — по запросу на каждый шард."""
+        changelist = super().get_changelist_instance(request)
+        counts = count_comments(news.pk for news in changelist.result_list)
+        for news in changelist.result_list:
+            news.stored_comments = counts.get(news.pk, 0)
+        return changelist
+
+    @admin.display(description='Комментариев в хранилище')
+    def stored_comments(self, news):
+        return news.stored_comments
@@ -1,7 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
     verbose_name = 'Новости'
+
+    def ready(self):
+        from . import sharding, signals  # noqa: F401
+        from yanews.sqlite import set_sqlite_pragmas
+        from yanews.timing import install_timing_wrapper
+        connection_created.connect(set_sqlite_pragmas)
+        connection_created.connect(install_timing_wrapper)
@@ -0,0 +1,103 @@
+import threading
+from collections import Counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+
+from yanews.replicas import primary_reads
+
+PAGE_VERSION_KEY = 'news:home:version'
+PAGE_KEY = 'news:home:{version}:{path}'
+CARD_FRAGMENT = 'news_card'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.NEWS_CACHE_ALIAS]
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def get_stats():
+    """Счётчики попаданий и промахов кэша в текущем процессе."""
+    with _stats_lock:
+        return {
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'invalidations': _stats['invalidations'],
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def page_key(path):
+    """Ключ кэша страницы ленты; меняется при каждой инвалидации."""
+    cache = get_cache()
+    version = cache.get(PAGE_VERSION_KEY)
+    if version is None:
+        version = uuid4().hex
+        cache.add(PAGE_VERSION_KEY, version, None)
+        version = cache.get(PAGE_VERSION_KEY, version)
+    return PAGE_KEY.format(version=version, path=path)
+
+
+def invalidate_home_page():
+    """
+    Сбрасывает кэш страниц ленты новостей.
+
+    Страницы не удаляются по одной: меняется версия в их ключах,
+    и старые записи просто перестают запрашиваться.
+    """
+    get_cache().set(PAGE_VERSION_KEY, uuid4().hex, None)
+    _count('invalidations')
+
+
+def invalidate_news(news_id, comment_count):
+    """Сбрасывает кэш ленты и карточки новости."""
+    invalidate_home_page()
+    get_cache().delete(
+        make_template_fragment_key(CARD_FRAGMENT, (news_id, comment_count))
+    )
+
+
+class AnonymousPageCacheMixin:
+    """
+    Кэширует страницу целиком для анонимных пользователей.
+
+    Страница для кэша строится по основной БД, а не по реплике: иначе
+    после записи реплика, которая ещё не догнала основную БД, попала бы
+    в кэш под новой версией ключа на NEWS_CACHE_TIMEOUT.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = page_key(request.get_full_path())
+        cache = get_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            _count('hits')
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        _count('misses')
+        with primary_reads():
+            response = super().get(request, *args, **kwargs)
+            response.render()
+        if response.status_code == 200:
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                settings.NEWS_CACHE_TIMEOUT
+            )
+        return response
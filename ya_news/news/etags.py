@@ -0,0 +1,95 @@
+"""
+Валидаторы для условных GET-запросов (If-None-Match).
+
+ETag считается одним агрегирующим запросом, без рендеринга шаблона,
+и учитывает пользователя: шапка и ссылки правки у каждого свои.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .cache import page_key
+from .feed import SNAPSHOT_ID
+from .models import HomeFeedSnapshot, News
+from .pagination import KeysetPaginationMixin, KeysetPaginator
+from .sharding import comments_for_news
+
+
+def make_etag(request, *state):
+    parts = (request.user.pk, request.get_full_path(), *state)
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def feed_state(cursor):
+    """
+    Состояние страницы ленты в БД, без рендеринга.
+
+    Первая страница при HOME_FEED_SNAPSHOT отдаётся из снимка, и её
+    состояние — время сборки снимка (его пересобирает и rebuild_home_feed
+    по cron). Иначе это строки новостей страницы, выбранные по индексу
+    ленты.
+    """
+    if settings.HOME_FEED_SNAPSHOT and not cursor:
+        snapshot = HomeFeedSnapshot.objects.filter(
+            pk=SNAPSHOT_ID
+        ).values_list('built', 'stale').first()
+        if snapshot is not None and not (
+            snapshot[1] and settings.HOME_FEED_FALLBACK
+        ):
+            return [snapshot]
+    paginator = KeysetPaginator(
+        News.objects.all(), settings.NEWS_COUNT_ON_HOME_PAGE
+    )
+    return list(
+        paginator.after(cursor).values_list(
+            'pk', 'title', 'text', 'date', 'comment_count'
+        )[:paginator.per_page + 1]
+    )
+
+
+def news_list_etag(request, *args, **kwargs):
+    """
+    ETag ленты новостей.
+
+    Строится по ключу кэша страницы: версию в ключе меняет любое
+    изменение новостей и комментариев (news/signals.py), в том числе
+    перенос комментария и правка заголовка. Версия хранится в кэше
+    NEWS_CACHE_ALIAS, по умолчанию своём у каждого процесса, и не
+    меняется от записей других процессов. Аноним и так получает
+    страницу из того же кэша, поэтому его ETag обходится без запросов
+    к БД, а пользователю в ETag добавляется feed_state.
+    """
+    state = [page_key(request.get_full_path())]
+    if request.user.is_authenticated:
+        state += feed_state(
+            request.GET.get(KeysetPaginationMixin.cursor_kwarg)
+        )
+    return make_etag(request, *state)
+
+
+def news_detail_etag(request, pk):
+    """ETag страницы новости: сама новость и её комментарии."""
+    if settings.COMMENT_SHARDS:
+        return sharded_news_detail_etag(request, pk)
+    state = News.objects.filter(pk=pk).annotate(
+        comments=Count('comment'),
+        comments_updated=Max('comment__updated'),
+    ).values_list('title', 'text', 'date', 'comments', 'comments_updated')
+    state = state.order_by().first()
+    if state is None:
+        return None
+    return make_etag(request, *state)
+
+
+def sharded_news_detail_etag(request, pk):
+    # Комментарии в другой БД: новость и их агрегат — двумя запросами.
+    state = News.objects.filter(pk=pk).values_list(
+        'title', 'text', 'date'
+    ).order_by().first()
+    if state is None:
+        return None
+    comments = comments_for_news(pk).order_by().aggregate(
+        comments=Count('pk'), comments_updated=Max('updated')
+    )
+    return make_etag(request, *state, *comments.values())
@@ -0,0 +1,157 @@
+"""
+Снимок первой страницы ленты (HomeFeedSnapshot).
+
+При HOME_FEED_SNAPSHOT = True NewsList берёт первую страницу из снимка
+одним запросом по первичному ключу. После изменения новостей или
+комментариев снимок пересобирается фоновым потоком с задержкой
+HOME_FEED_DEBOUNCE секунд, чтобы серия правок пересобрала его один раз,
+и после пересборки сбрасывает кэш ленты.
+Правка комментариев обновляет в снимке только счётчики затронутых
+новостей. Если HOME_FEED_FALLBACK = True, изменение помечает снимок
+устаревшим, и до пересборки лента строится живым запросом.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .cache import invalidate_home_page
+from .models import HomeFeedSnapshot, News
+from .pagination import KeysetPage, KeysetPaginator
+
+SNAPSHOT_ID = 1
+FIELDS = ('id', 'title', 'text', 'date', 'comment_count')
+
+
+def _fields():
+    return [News._meta.get_field(name) for name in FIELDS]
+
+
+def dump_news(news):
+    return {
+        field.attname: field.value_to_string(news) for field in _fields()
+    }
+
+
+def load_news(data):
+    return News(**{
+        field.attname: field.to_python(data[field.attname])
+        for field in _fields()
+    })
+
+
+def build_snapshot():
+    """Пересобирает снимок заново тем же запросом, что и NewsList."""
+    paginator = KeysetPaginator(
+        News.objects.all(), settings.NEWS_COUNT_ON_HOME_PAGE
+    )
+    page = paginator.get_page()
+    HomeFeedSnapshot.objects.update_or_create(
+        pk=SNAPSHOT_ID,
+        defaults={
+            'news': [dump_news(news) for news in page],
+            'next_cursor': page.next_cursor or '',
+            'stale': False,
+        },
+    )
+    # Пока снимок пересобирался, в кэш могла попасть страница из старого.
+    invalidate_home_page()
+
+
+def refresh_counts(news_ids):
+    """Обновляет в снимке счётчики комментариев новостей из news_ids."""
+    snapshot = HomeFeedSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+    if snapshot is None:
+        return build_snapshot()
+    items = {item['id']: item for item in snapshot.news}
+    affected = [pk for pk in news_ids if str(pk) in items]
+    if affected:
+        counts = News.objects.filter(pk__in=affected).values_list(
+            'pk', 'comment_count'
+        )
+        for pk, count in counts:
+            items[str(pk)]['comment_count'] = str(count)
+    elif not snapshot.stale:
+        return
+    snapshot.stale = False
+    snapshot.save(update_fields=('news', 'stale', 'built'))
+    invalidate_home_page()
+
+
+def get_home_page():
+    """Первая страница ленты из снимка или None, если снимок не годится."""
+    snapshot = HomeFeedSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+    if snapshot is None:
+        schedule_rebuild()
+        return None
+    if snapshot.stale and settings.HOME_FEED_FALLBACK:
+        return None
+    return KeysetPage(
+        [load_news(item) for item in snapshot.news],
+        snapshot.next_cursor or None,
+    )
+
+
+class FeedRebuilder:
+    """
+    Отложенная пересборка снимка.
+
+    Изменения за время задержки копятся: id новостей с изменёнными
+    комментариями или признак полной пересборки. Пересборки идут
+    по одной, чтобы старый снимок не записался поверх нового.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.news_ids = set()
+        self.full = False
+        self.timer = None
+
+    def schedule(self, news_ids=None):
+        with self.lock:
+            if news_ids is None:
+                self.full = True
+            else:
+                self.news_ids.update(news_ids)
+            delay = settings.HOME_FEED_DEBOUNCE
+            if delay is not None:
+                if self.timer is None:
+                    self.timer = threading.Timer(delay, self.run)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        with self.build_lock:
+            with self.lock:
+                full, news_ids = self.full, self.news_ids
+                self.full, self.news_ids, self.timer = False, set(), None
+            if full:
+                build_snapshot()
+            elif news_ids:
+                refresh_counts(news_ids)
+
+    def run(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+
+_rebuilder = FeedRebuilder()
+
+
+def schedule_rebuild(news_ids=None):
+    """
+    Планирует пересборку снимка.
+
+    news_ids — новости, у которых изменились только комментарии;
+    None — полная пересборка.
+    """
+    if not settings.HOME_FEED_SNAPSHOT:
+        return
+    if settings.HOME_FEED_FALLBACK:
+        HomeFeedSnapshot.objects.filter(pk=SNAPSHOT_ID).update(stale=True)
+    _rebuilder.schedule(news_ids)
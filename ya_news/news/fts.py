@@ -0,0 +1,43 @@
+"""
+Триггеры полнотекстового индекса news_comment_fts.
+
+В SQLite миграции, пересоздающие таблицу news_comment (AddField,
+AlterField, RemoveField), удаляют вместе с ней и триггеры индекса.
+Такие миграции окружают операцию двумя RunPython:
+
+    migrations.RunPython(migrations.RunPython.noop, recreate_triggers),
+    ...,
+    migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+
+Модуль импортируется миграциями, поэтому не зависит от моделей.
+"""
+
+TRIGGERS_SQL = (
+    """
+    CREATE TRIGGER news_comment_fts_insert AFTER INSERT ON news_comment BEGIN
+        INSERT INTO news_comment_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER news_comment_fts_delete AFTER DELETE ON news_comment BEGIN
+        INSERT INTO news_comment_fts(news_comment_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER news_comment_fts_update
+    AFTER UPDATE OF text ON news_comment BEGIN
+        INSERT INTO news_comment_fts(news_comment_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO news_comment_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+
+def recreate_triggers(apps, schema_editor):
+    """Полнотекстовый индекс FTS5 есть только в SQLite."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
@@ -0,0 +1,414 @@
+"""
+Отложенная запись комментариев (write-behind).
+
+Проверенные формой комментарии ставятся в ограниченную очередь
+процесса, а фоновый поток записывает их пачками через bulk_create:
+одна транзакция SQLite на пачку вместо транзакции на комментарий.
+
+Доставка «хотя бы один раз»: до того как submit вернёт управление,
+комментарий записывается в журнал на диске (CommentJournal), и после
+падения процесса незаписанные комментарии воспроизводятся при старте
+писателя. Комментарий, который БД отвергла не из-за блокировки,
+уходит в файл dead letter, а не теряется.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from pathlib import Path
+from time import monotonic, sleep
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models import F
+from django.dispatch import receiver
+
+from .cache import invalidate_home_page
+from .feed import schedule_rebuild
+from .models import Comment, News
+from .sharding import atomic_with_shards, bulk_create_comments, shard_for_news
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 0.05
+MAX_RETRY_DELAY = 2
+_STOP = object()
+
+
+def write_comments(comments):
+    """
+    Сохраняет комментарии одной транзакцией и обновляет счётчики.
+
+    При шардировании комментарии раскладываются по своим шардам
+    в транзакциях, открытых вместе с транзакцией основной БД.
+    Возвращает число комментариев по id новостей.
+    """
+    aliases = {shard_for_news(comment.news_id) for comment in comments}
+    with atomic_with_shards(*aliases):
+        bulk_create_comments(comments)
+        counts = Counter(comment.news_id for comment in comments)
+        for news_id, count in counts.items():
+            News.objects.filter(pk=news_id).update(
+                comment_count=F('comment_count') + count
+            )
+    return counts
+
+
+def comments_written(counts):
+    """Сбрасывает кэш ленты и планирует пересборку снимка."""
+    # bulk_create не отправляет post_save, сбрасываем кэш ленты сами.
+    invalidate_home_page()
+    schedule_rebuild(counts)
+
+
+def is_busy(error):
+    """Ошибка занятой SQLite («database is locked»): запись можно повторить."""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def write_with_retry(comments):
+    """
+    Повторяет запись, пока SQLite занята.
+
+    Паузы между попытками растут от RETRY_DELAY до MAX_RETRY_DELAY,
+    число попыток не ограничено: пока писатель ждёт, очередь
+    заполняется, и submit начинает писать сам, замедляя запросы.
+    Другие ошибки БД (нет таблицы, диск заполнен, IntegrityError)
+    пробрасываются сразу.
+    """
+    delay = RETRY_DELAY
+    while True:
+        try:
+            return write_comments(comments)
+        except OperationalError as error:
+            if not is_busy(error):
+                raise
+            logger.warning('Запись комментариев отложена: %s', error)
+            sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+
+def comment_record(comment):
+    return {
+        'news': comment.news_id,
+        'author': comment.author_id,
+        'text': comment.text,
+    }
+
+
+def comment_from_record(record):
+    return Comment(
+        news_id=record['news'], author_id=record['author'],
+        text=record['text'],
+    )
+
+
+def append_lines(file, records, sync=True):
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    file.flush()
+    if sync:
+        os.fsync(file.fileno())
+
+
+def read_pending(file):
+    """Записи журнала без отметки {"done": id}."""
+    entries = {}
+    done = set()
+    for line in file:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Строка, недописанная при падении процесса.
+            continue
+        if 'done' in record:
+            done.add(record['done'])
+        else:
+            entries[record['id']] = record
+    return [
+        record for entry_id, record in entries.items()
+        if entry_id not in done
+    ]
+
+
+class CommentJournal:
+    """
+    Журнал принятых комментариев в каталоге directory.
+
+    Каждая очередь пишет свой файл JSONL и держит на нём flock.
+    Комментарий дописывается с fsync до постановки в очередь, после
+    записи в БД или в dead letter отмечается строкой {"done": id},
+    а когда незаписанных не остаётся, файл обрезается. Файл, на
+    котором никто не держит flock, остался от упавшего процесса:
+    recover() переносит его незаписанные комментарии в свой журнал.
+    Отметка о записи может не дожить до падения, поэтому после
+    восстановления комментарий иногда записывается повторно.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / (
+            f'comments-{os.getpid()}-{uuid4().hex}.jsonl'
+        )
+        self.file = open(self.path, 'a', encoding='utf-8')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def append(self, comment):
+        """Записывает комментарий на диск и возвращает id записи."""
+        record = {'id': uuid4().hex, **comment_record(comment)}
+        with self.lock:
+            append_lines(self.file, [record])
+            self.pending.add(record['id'])
+        return record['id']
+
+    def done(self, entry_ids):
+        with self.lock:
+            self.pending.difference_update(entry_ids)
+            if self.pending:
+                append_lines(
+                    self.file,
+                    [{'done': entry_id} for entry_id in entry_ids],
+                    sync=False,
+                )
+            else:
+                self.file.truncate(0)
+
+    def recover(self):
+        """Забирает незаписанные комментарии из журналов упавших процессов."""
+        recovered = []
+        for path in sorted(self.directory.glob('comments-*.jsonl')):
+            if path == self.path:
+                continue
+            with open(path, encoding='utf-8') as file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Процесс-владелец ещё работает.
+                    continue
+                if os.fstat(file.fileno()).st_nlink == 0:
+                    # Журнал уже забрал другой процесс.
+                    continue
+                records = read_pending(file)
+                with self.lock:
+                    append_lines(self.file, records)
+                    self.pending.update(record['id'] for record in records)
+                path.unlink()
+            recovered += records
+        return recovered
+
+    def close(self):
+        """Закрывает журнал; файл с незаписанными остаётся для recover()."""
+        with self.lock:
+            if not self.pending:
+                self.path.unlink()
+            self.file.close()
+
+
+class CommentQueue:
+    """
+    Ограниченная очередь комментариев с фоновым писателем.
+
+    Когда очередь заполнена, submit ждёт место не дольше put_timeout,
+    а затем записывает комментарий сам: запрос замедляется, но
+    комментарий не теряется. stop() дописывает всё, что осталось
+    в очереди. Без запущенного потока очередь разбирает drain().
+
+    journal — CommentJournal или None (без журнала); dead_letter —
+    путь к файлу JSONL для комментариев, которые БД отвергла.
+    """
+
+    def __init__(self, maxsize=1000, batch_size=100, flush_interval=0.05,
+                 put_timeout=1, journal=None, dead_letter=None):
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.journal = journal
+        self.dead_letter_path = dead_letter
+        self.dead_letter_lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='comment-writer', daemon=True
+        )
+        self.thread.start()
+        self.replay()
+
+    def replay(self):
+        """Ставит в очередь комментарии из журналов упавших процессов."""
+        if self.journal is None:
+            return
+        for record in self.journal.recover():
+            self.queue.put((record['id'], comment_from_record(record)))
+
+    def submit(self, comment):
+        """
+        Ставит комментарий в очередь; False — записан синхронно.
+
+        Комментарий попадает в журнал до того, как submit вернёт
+        управление.
+        """
+        entry_id = None
+        if self.journal is not None:
+            entry_id = self.journal.append(comment)
+        item = (entry_id, comment)
+        try:
+            self.queue.put(item, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.flush([item])
+            return False
+
+    def flush(self, batch):
+        try:
+            counts = write_with_retry([comment for _, comment in batch])
+        except DatabaseError:
+            # Например, новость удалили, пока комментарии ждали
+            # в очереди: пишем по одному, чтобы не потерять остальные.
+            for item in batch:
+                self.flush_one(item)
+            return
+        self.done(batch)
+        comments_written(counts)
+
+    def flush_one(self, item):
+        entry_id, comment = item
+        try:
+            counts = write_with_retry([comment])
+        except DatabaseError as error:
+            self.send_to_dead_letter(comment, error)
+            self.done([item])
+            return
+        self.done([item])
+        comments_written(counts)
+
+    def done(self, batch):
+        if self.journal is not None:
+            self.journal.done([entry_id for entry_id, _ in batch])
+
+    def send_to_dead_letter(self, comment, error):
+        logger.error('Комментарий не записан, отправлен в dead letter: %s',
+                     error)
+        if self.dead_letter_path is None:
+            return
+        record = {**comment_record(comment), 'error': str(error)}
+        with self.dead_letter_lock:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as file:
+                append_lines(file, [record])
+
+    def flush_or_log(self, batch):
+        try:
+            self.flush(batch)
+        except Exception:
+            # Например, не удалось дописать dead letter: комментарии
+            # остаются в журнале и будут записаны после перезапуска.
+            logger.exception(
+                'Пачка из %d комментариев не записана', len(batch)
+            )
+
+    def next_batch(self, first):
+        batch = [first]
+        deadline = monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    return self.drain()
+                self.flush_or_log(self.next_batch(item))
+        finally:
+            connection.close()
+
+    def drain(self):
+        """Записывает всё, что сейчас лежит в очереди."""
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                self.flush_or_log(batch)
+                batch = []
+        if batch:
+            self.flush_or_log(batch)
+
+    def stop(self, timeout=None):
+        """Дописывает очередь, останавливает поток и закрывает журнал."""
+        if self.thread is None:
+            self.drain()
+        else:
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                return
+            self.thread = None
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_comment_queue():
+    """Очередь из настроек COMMENT_QUEUE_*, запущенная один раз на процесс."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                journal = None
+                if settings.COMMENT_QUEUE_JOURNAL:
+                    journal = CommentJournal(settings.COMMENT_QUEUE_JOURNAL)
+                _queue = CommentQueue(
+                    maxsize=settings.COMMENT_QUEUE_SIZE,
+                    batch_size=settings.COMMENT_QUEUE_BATCH_SIZE,
+                    flush_interval=settings.COMMENT_QUEUE_FLUSH_INTERVAL,
+                    put_timeout=settings.COMMENT_QUEUE_PUT_TIMEOUT,
+                    journal=journal,
+                    dead_letter=settings.COMMENT_QUEUE_DEAD_LETTER,
+                )
+                _queue.start()
+                atexit.register(_queue.stop)
+    return _queue
+
+
+@receiver(setting_changed)
+def reset_comment_queue(setting=None, **kwargs):
+    if setting is not None and not setting.startswith('COMMENT_'):
+        return
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            atexit.unregister(_queue.stop)
+            _queue.stop()
+            _queue = None
@@ -0,0 +1,137 @@
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+
+from news.ingest import CommentQueue
+from news.models import Comment, News
+from yanews.settings_prod import SQLITE_PRAGMAS
+
+PROFILES = (
+    ('по умолчанию', {}, False),
+    ('prod', SQLITE_PRAGMAS, False),
+    ('prod + очередь', SQLITE_PRAGMAS, True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает конкурентную запись и чтение комментариев в файловой '
+        'SQLite с настройками по умолчанию, с PRAGMA профиля prod и '
+        'с отложенной записью комментариев через очередь.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--comments', type=int, default=2_000)
+
+    def worker(self, action, start, stats):
+        done = errors = 0
+        try:
+            # Соединения не прогреваются: первая запись идёт на новом
+            # соединении, как у запроса без CONN_MAX_AGE.
+            start.wait()
+            deadline = perf_counter() + self.seconds
+            while perf_counter() < deadline:
+                try:
+                    action()
+                    done += 1
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    errors += 1
+        finally:
+            connections.close_all()
+        with self.lock:
+            stats['done'] += done
+            stats['errors'] += errors
+
+    def run_profile(self, options, write_behind):
+        call_command('migrate', verbosity=0)
+        author = get_user_model().objects.create(username='benchmark')
+        news = News.objects.create(title='Новость', text='Текст')
+        Comment.objects.bulk_create(
+            Comment(news=news, author=author, text=f'Текст {index}')
+            for index in range(options['comments'])
+        )
+
+        def write_now():
+            with transaction.atomic():
+                Comment.objects.create(news=news, author=author, text='Ещё')
+                News.objects.filter(pk=news.pk).update(
+                    comment_count=F('comment_count') + 1
+                )
+
+        comment_queue = CommentQueue()
+
+        def write_behind_queue():
+            comment_queue.submit(Comment(news=news, author=author, text='Ещё'))
+
+        write = write_now
+        if write_behind:
+            comment_queue.start()
+            write = write_behind_queue
+
+        def read():
+            list(news.comment_set.select_related('author'))
+
+        writes = {'done': 0, 'errors': 0}
+        reads = {'done': 0, 'errors': 0}
+        start = threading.Barrier(options['writers'] + options['readers'])
+        threads = [
+            threading.Thread(target=self.worker, args=(write, start, writes))
+            for _ in range(options['writers'])
+        ] + [
+            threading.Thread(target=self.worker, args=(read, start, reads))
+            for _ in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if write_behind:
+            # Принятые, но не записанные комментарии тоже входят в замер:
+            # время их записи честно прибавляется к длительности прогона.
+            started = perf_counter()
+            comment_queue.stop()
+            writes['drain'] = perf_counter() - started
+            written = Comment.objects.count() - options['comments']
+            if written != writes['done']:
+                self.stderr.write(
+                    f'Принято {writes["done"]}, записано {written}.'
+                )
+        return writes, reads
+
+    def handle(self, *args, **options):
+        self.lock = threading.Lock()
+        self.seconds = seconds = options['seconds']
+        database = connections.databases['default']
+        old_name = database['NAME']
+        try:
+            for title, pragmas, write_behind in PROFILES:
+                with tempfile.TemporaryDirectory() as directory:
+                    connections.close_all()
+                    database['NAME'] = Path(directory) / 'benchmark.sqlite3'
+                    with override_settings(SQLITE_PRAGMAS=pragmas):
+                        writes, reads = self.run_profile(
+                            options, write_behind
+                        )
+                    connections.close_all()
+                elapsed = seconds + writes.get('drain', 0)
+                self.stdout.write(
+                    f'{title:>14}: записей {writes["done"] / elapsed:.0f}/с, '
+                    f'чтений {reads["done"] / seconds:.1f}/с, '
+                    f'ошибок «database is locked»: '
+                    f'{writes["errors"] + reads["errors"]}'
+                )
+        finally:
+            database['NAME'] = old_name
@@ -0,0 +1,65 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from news.moderation import BadWordsFilter
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def loop_find(words, text):
+    """Прежняя проверка из CommentForm.clean_text."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return word
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость проверки комментария на запрещённые слова '
+        'циклом по списку и скомпилированным фильтром.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=10_000)
+        parser.add_argument('--size', type=int, default=64 * 1024)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def measure(self, find, text, repeat):
+        start = perf_counter()
+        for _ in range(repeat):
+            find(text)
+        return repeat / (perf_counter() - start)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        words = [
+            ''.join(rnd.choices(ALPHABET, k=rnd.randint(6, 12)))
+            for _ in range(options['words'])
+        ]
+        # Чистый текст — худший случай: проверяются все слова.
+        text = ''.join(
+            rnd.choice(ALPHABET + ' ') for _ in range(options['size'])
+        )
+        start = perf_counter()
+        bad_words_filter = BadWordsFilter(words)
+        compile_time = perf_counter() - start
+        found = bad_words_filter.find(text)
+        assert (found is None) == (loop_find(words, text) is None)
+        loop_rate = self.measure(
+            lambda value: loop_find(words, value), text, options['repeat']
+        )
+        filter_rate = self.measure(
+            bad_words_filter.find, text, options['repeat']
+        )
+        self.stdout.write(
+            f'Слов: {len(words)}, размер текста: {len(text)} символов\n'
+            f'Компиляция фильтра: {compile_time * 1000:.1f} мс\n'
+            f'Цикл по списку: {loop_rate:.2f} комментариев/с\n'
+            f'Фильтр: {filter_rate:.2f} комментариев/с\n'
+            f'Ускорение: {filter_rate / loop_rate:.1f}x'
+        )
@@ -0,0 +1,91 @@
+import random
+from itertools import accumulate
+from statistics import quantiles
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from news.models import Comment, News
+from news.search import search
+from news.sharding import bulk_create_comments
+
+SYLLABLES = (
+    'ба', 'ве', 'го', 'ду', 'жи', 'зо', 'ки', 'ла', 'ме', 'но', 'пу', 'ра',
+    'си', 'то', 'фу', 'ха', 'це', 'чи', 'ша', 'ю',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную тестовую БД синтетическими новостями и '
+        'комментариями и измеряет задержку поиска (p50/p99).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--news', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=900_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def phrase(self, rnd, length):
+        # Частоты слов распределены по закону Ципфа, как в живом тексте.
+        return ' '.join(
+            rnd.choices(self.words, cum_weights=self.weights, k=length)
+        )
+
+    def seed(self, rnd, options):
+        author = get_user_model().objects.create(username='benchmark')
+        batch_size = options['batch_size']
+        for start in range(0, options['news'], batch_size):
+            count = min(batch_size, options['news'] - start)
+            News.objects.bulk_create(
+                News(title=self.phrase(rnd, 3), text=self.phrase(rnd, 30))
+                for _ in range(count)
+            )
+        news_ids = list(News.objects.values_list('pk', flat=True))
+        for start in range(0, options['comments'], batch_size):
+            count = min(batch_size, options['comments'] - start)
+            bulk_create_comments([
+                Comment(
+                    news_id=rnd.choice(news_ids), author=author,
+                    text=self.phrase(rnd, 12),
+                )
+                for _ in range(count)
+            ])
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        self.words = list({
+            ''.join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4)))
+            for _ in range(options['vocabulary'])
+        })
+        self.weights = list(accumulate(
+            1 / rank for rank in range(1, len(self.words) + 1)
+        ))
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            start = perf_counter()
+            self.seed(rnd, options)
+            self.stdout.write(
+                f'Корпус: {options["news"]} новостей, '
+                f'{options["comments"]} комментариев, '
+                f'{perf_counter() - start:.1f} с'
+            )
+            timings = []
+            for _ in range(options['queries']):
+                query = self.phrase(rnd, rnd.randint(1, 3))
+                start = perf_counter()
+                list(search(query, page=rnd.randint(1, 3)))
+                timings.append((perf_counter() - start) * 1000)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {len(timings)}, p50: {percentiles[49]:.2f} мс, '
+            f'p99: {percentiles[98]:.2f} мс'
+        ))
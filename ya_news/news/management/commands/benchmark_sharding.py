@@ -0,0 +1,130 @@
+import multiprocessing
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test.utils import override_settings
+
+from news.models import Comment, News
+from news.sharding import count_comments
+from yanews.settings_prod import SQLITE_PRAGMAS
+
+SHARD_PREFIX = 'benchmark_shard_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность записи комментариев в зависимости от '
+        'числа шардов: каждый шард — отдельный файл SQLite со своей '
+        'блокировкой записи. Писатели — отдельные процессы, чтобы '
+        'упираться в блокировки SQLite, а не в GIL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shards', type=int, nargs='+', default=[1, 2, 4]
+        )
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--news', type=int, default=64)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument(
+            '--pragmas', choices=('default', 'prod'), default='default',
+            help='PRAGMA SQLite: по умолчанию (fsync на каждый коммит) '
+                 'или профиля prod (WAL, synchronous=NORMAL).'
+        )
+
+    def writer(self, news_ids, author_id, start, results):
+        done = errors = 0
+        try:
+            start.wait()
+            deadline = perf_counter() + self.seconds
+            while perf_counter() < deadline:
+                try:
+                    # save(), а не objects.create(): роутеру нужен
+                    # сам комментарий, чтобы выбрать шард по news_id.
+                    Comment(
+                        news_id=random.choice(news_ids),
+                        author_id=author_id,
+                        text='Комментарий',
+                    ).save()
+                    done += 1
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    errors += 1
+        finally:
+            connections.close_all()
+            results.put((done, errors))
+
+    def run(self, directory, shards, options):
+        aliases = [f'{SHARD_PREFIX}{index}' for index in range(shards)]
+        for alias in aliases:
+            # Словарь настроек общий с обёрткой соединения, поэтому
+            # между прогонами меняем в нём только имя файла.
+            connections.databases.setdefault(alias, {
+                **connections.databases[DEFAULT_DB_ALIAS],
+                'FOREIGN_KEYS': False,
+            })['NAME'] = Path(directory) / f'{alias}.sqlite3'
+        try:
+            with override_settings(COMMENT_SHARDS=aliases):
+                for alias in (DEFAULT_DB_ALIAS, *aliases):
+                    call_command('migrate', database=alias, verbosity=0)
+                author = get_user_model().objects.create(username='bench')
+                News.objects.bulk_create(
+                    News(title=f'Новость {index}', text='Текст')
+                    for index in range(options['news'])
+                )
+                news_ids = list(News.objects.values_list('pk', flat=True))
+                # Соединения не должны наследоваться дочерними процессами.
+                connections.close_all()
+                context = multiprocessing.get_context('fork')
+                start = context.Barrier(options['writers'])
+                results = context.Queue()
+                writers = [
+                    context.Process(
+                        target=self.writer,
+                        args=(news_ids, author.pk, start, results),
+                    )
+                    for _ in range(options['writers'])
+                ]
+                for process in writers:
+                    process.start()
+                done, errors = map(sum, zip(*(
+                    results.get() for _ in writers
+                )))
+                for process in writers:
+                    process.join()
+                stored = sum(count_comments(news_ids).values())
+        finally:
+            connections.close_all()
+        return done, errors, stored
+
+    def handle(self, *args, **options):
+        self.seconds = options['seconds']
+        pragmas = SQLITE_PRAGMAS if options['pragmas'] == 'prod' else {}
+        database = connections.databases[DEFAULT_DB_ALIAS]
+        old_name = database['NAME']
+        try:
+            for shards in options['shards']:
+                with tempfile.TemporaryDirectory() as directory:
+                    connections.close_all()
+                    database['NAME'] = Path(directory) / 'benchmark.sqlite3'
+                    with override_settings(SQLITE_PRAGMAS=pragmas):
+                        done, errors, stored = self.run(
+                            directory, shards, options
+                        )
+                self.stdout.write(
+                    f'шардов: {shards}: записей {done / self.seconds:.0f}/с, '
+                    f'ошибок «database is locked»: {errors}, '
+                    f'сохранено: {stored} из {done}'
+                )
+        finally:
+            database['NAME'] = old_name
+            for alias in list(connections.databases):
+                if alias.startswith(SHARD_PREFIX):
+                    del connections.databases[alias]
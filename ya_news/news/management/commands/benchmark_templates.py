@@ -0,0 +1,71 @@
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template import Context
+from django.template.backends.django import DjangoTemplates
+from django.utils import timezone
+
+from news.models import News
+
+TEMPLATE_NAME = 'news/home.html'
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендеринга главной страницы с обычным '
+        'и с кэширующим загрузчиком шаблонов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000)
+        parser.add_argument('--renders', type=int, default=50)
+
+    def make_engine(self, loaders):
+        params = settings.TEMPLATES[0]
+        return DjangoTemplates({
+            'NAME': 'benchmark',
+            'DIRS': params['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': {**params['OPTIONS'], 'loaders': loaders},
+        }).engine
+
+    def measure(self, engine, context, renders):
+        timings = []
+        for _ in range(renders):
+            start = perf_counter()
+            engine.get_template(TEMPLATE_NAME).render(Context(context))
+            timings.append((perf_counter() - start) * 1000)
+        return median(timings)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        context = {
+            'object_list': [
+                News(
+                    pk=index, title=f'Новость {index}', text='Текст ' * 30,
+                    date=now, comment_count=index % 5,
+                )
+                for index in range(1, options['items'] + 1)
+            ],
+            # Нулевой таймаут отключает кэш карточек: меряем сам рендеринг.
+            'cache_timeout': 0,
+            'cache_alias': settings.NEWS_CACHE_ALIAS,
+        }
+        plain = self.measure(
+            self.make_engine(LOADERS), context, options['renders']
+        )
+        cached = self.measure(
+            self.make_engine([(CACHED_LOADER, LOADERS)]),
+            context, options['renders']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{TEMPLATE_NAME}, {options["items"]} новостей, p50: '
+            f'без кэша {plain:.2f} мс, с кэшем загрузчика {cached:.2f} мс'
+        ))
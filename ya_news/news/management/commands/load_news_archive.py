@@ -0,0 +1,132 @@
+import json
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+
+from news.models import ArchiveLoad, Comment, News
+from news.sharding import (
+    atomic_with_shards, bulk_create_comments, shard_for_news
+)
+
+WHITESPACE = ' \t\r\n'
+
+
+def iter_fixture_objects(file, chunk_size=1 << 16):
+    """
+    Объекты из JSON-фикстуры по одному, без чтения файла целиком.
+
+    Фикстура — массив объектов; в памяти держится только текущий
+    кусок файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    started = False
+    while True:
+        buffer = buffer.lstrip(WHITESPACE + (',' if started else ''))
+        if not buffer:
+            if eof:
+                raise DeserializationError('Фикстура оборвалась.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        if not started:
+            if buffer[0] != '[':
+                raise DeserializationError('Фикстура должна быть массивом.')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if buffer[0] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as error:
+            if eof:
+                raise DeserializationError(error) from error
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield obj
+        buffer = buffer[end:]
+
+
+@contextmanager
+def keep_comment_created():
+    """
+    bulk_create проставляет auto_now_add текущим временем,
+    а из архива нужно сохранить исходную дату комментария.
+    """
+    field = Comment._meta.get_field('created')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает новости и комментарии из фикстуры формата '
+        'loaddata пачками через bulk_create. После сбоя повторный запуск '
+        'продолжает с последней сохранённой пачки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Загрузить архив с начала, забыв о прошлых запусках.'
+        )
+
+    def save_batch(self, batch, checkpoint):
+        news = [obj for obj in batch if isinstance(obj, News)]
+        comments = [obj for obj in batch if isinstance(obj, Comment)]
+        if len(news) + len(comments) != len(batch):
+            raise CommandError('Архив содержит объекты не News и Comment.')
+        if settings.COMMENT_SHARDS:
+            # Id комментария определяет его шард, поэтому id из архива
+            # не сохраняются: шард выдаёт их из своего диапазона.
+            for comment in comments:
+                comment.pk = None
+        aliases = {shard_for_news(comment.news_id) for comment in comments}
+        with atomic_with_shards(*aliases):
+            News.objects.bulk_create(news)
+            bulk_create_comments(comments)
+            checkpoint.objects_loaded += len(batch)
+            checkpoint.save(update_fields=('objects_loaded',))
+
+    def handle(self, *args, **options):
+        path = Path(options['path']).resolve()
+        checkpoint, _ = ArchiveLoad.objects.get_or_create(source=str(path))
+        if options['restart']:
+            checkpoint.objects_loaded = 0
+        skipped = checkpoint.objects_loaded
+        start = perf_counter()
+        with open(path, encoding='utf-8') as file, keep_comment_created():
+            raw_objects = iter_fixture_objects(file)
+            for _ in islice(raw_objects, skipped):
+                pass
+            objects = (obj.object for obj in Deserializer(raw_objects))
+            while True:
+                batch = list(islice(objects, options['batch_size']))
+                if not batch:
+                    break
+                self.save_batch(batch, checkpoint)
+        loaded = checkpoint.objects_loaded - skipped
+        seconds = perf_counter() - start
+        call_command('recount_comments', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пропущено загруженных ранее: {skipped}, загружено: {loaded}, '
+            f'{seconds:.2f} с, {loaded / seconds if seconds else 0:.0f} '
+            'объектов/с'
+        ))
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+from statistics import quantiles
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HOST = '127.0.0.1'
+RUNSERVER = [
+    sys.executable, 'manage.py', 'runserver', '--noreload', '--nothreading',
+    f'{HOST}:{{port}}',
+]
+UVICORN = [
+    sys.executable, '-m', 'uvicorn', 'yanews.asgi:application',
+    '--host', HOST, '--port', '{port}', '--workers', '1',
+    '--log-level', 'warning',
+]
+# Команда сервера и переменные окружения. asgi-sync — контрольный
+# замер: тот же сервер ASGI (uvicorn, один воркер), что и asgi-async,
+# поэтому разница между ними — разница представлений. wsgi — прежний
+# однопоточный сервер WSGI, с которым сравнивается переход на ASGI.
+SERVERS = {
+    'wsgi': (RUNSERVER, {'NEWS_ASYNC_VIEWS': '0'}),
+    'asgi-sync': (UVICORN, {'NEWS_ASYNC_VIEWS': '0'}),
+    'asgi-async': (UVICORN, {'NEWS_ASYNC_VIEWS': '1'}),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест чтения при медленных клиентах: однопоточный '
+        'сервер WSGI, синхронные и асинхронные представления в одном '
+        'воркере uvicorn. '
+        'Использует БД из текущих настроек, заполните её заранее '
+        'командой seed_benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--clients', type=int, default=10)
+        parser.add_argument(
+            '--slow-clients', type=int, default=20,
+            help='Клиенты, которые присылают заголовки запроса по частям.'
+        )
+        parser.add_argument(
+            '--slow-delay', type=float, default=0.2,
+            help='Пауза между строками заголовков медленного клиента, с.'
+        )
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument(
+            '--servers', nargs='+', choices=tuple(SERVERS),
+            default=list(SERVERS),
+        )
+
+    async def request(self, port, path, delay=0.0, extra_headers=5):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n'.encode())
+            if delay:
+                for index in range(extra_headers):
+                    await writer.drain()
+                    await asyncio.sleep(delay)
+                    writer.write(f'X-Slow-{index}: 1\r\n'.encode())
+            writer.write(b'Connection: close\r\n\r\n')
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        return status_line.split()[1:2] == [b'200']
+
+    async def client(self, port, path, deadline, timings, errors):
+        while perf_counter() < deadline:
+            start = perf_counter()
+            try:
+                ok = await self.request(port, path)
+            except OSError:
+                ok = False
+            if ok:
+                timings.append((perf_counter() - start) * 1000)
+            else:
+                errors.append(1)
+
+    async def slow_client(self, port, path, deadline, delay):
+        while perf_counter() < deadline:
+            try:
+                await self.request(port, path, delay=delay)
+            except OSError:
+                await asyncio.sleep(delay)
+
+    async def load(self, port, options):
+        timings, errors = [], []
+        deadline = perf_counter() + options['seconds']
+        await asyncio.gather(*(
+            self.slow_client(port, options['path'], deadline,
+                             options['slow_delay'])
+            for _ in range(options['slow_clients'])
+        ), *(
+            self.client(port, options['path'], deadline, timings, errors)
+            for _ in range(options['clients'])
+        ))
+        return timings, errors
+
+    def wait_for_port(self, process, port, timeout=30):
+        deadline = perf_counter() + timeout
+        while perf_counter() < deadline:
+            if process.poll() is not None:
+                raise CommandError('Сервер завершился при запуске.')
+            try:
+                socket.create_connection((HOST, port), timeout=1).close()
+                return
+            except OSError:
+                sleep(0.1)
+        raise CommandError(f'Сервер не открыл порт {port} за {timeout} с.')
+
+    def run_server(self, name, options):
+        port = free_port()
+        server, env = SERVERS[name]
+        command = [part.format(port=port) for part in server]
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env={**os.environ, **env},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_port(process, port)
+            return asyncio.run(self.load(port, options))
+        finally:
+            process.terminate()
+            process.wait()
+
+    def handle(self, *args, **options):
+        for name in options['servers']:
+            timings, errors = self.run_server(name, options)
+            if len(timings) < 2:
+                self.stdout.write(
+                    f'{name}: успешных запросов {len(timings)}, '
+                    f'ошибок {len(errors)}'
+                )
+                continue
+            percentiles = quantiles(timings, n=100)
+            self.stdout.write(
+                f'{name}: {len(timings) / options["seconds"]:.1f} запросов/с, '
+                f'p50: {percentiles[49]:.1f} мс, '
+                f'p99: {percentiles[98]:.1f} мс, ошибок: {len(errors)}'
+            )
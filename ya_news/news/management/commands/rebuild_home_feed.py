@@ -0,0 +1,27 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from news.feed import build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает снимок первой страницы ленты (HomeFeedSnapshot) '
+        'один раз или каждые --interval секунд, например вместо фонового '
+        'потока или в дополнение к нему.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между пересборками, с; 0 — пересобрать один раз.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            build_snapshot()
+            self.stdout.write('Снимок ленты пересобран.')
+            if not options['interval']:
+                return
+            sleep(options['interval'])
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from news.cache import invalidate_home_page
+from news.feed import build_snapshot
+from news.models import Comment, News
+from news.sharding import count_comments
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поле comment_count у всех новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def recount_sharded(self, batch_size):
+        """Комментарии в шардах: счётчики собираются по каждому шарду."""
+        ids = list(News.objects.values_list('pk', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            counts = count_comments(batch)
+            with transaction.atomic():
+                News.objects.bulk_update(
+                    [
+                        News(pk=pk, comment_count=counts.get(pk, 0))
+                        for pk in batch
+                    ],
+                    ('comment_count',),
+                )
+        return len(ids)
+
+    def handle(self, *args, **options):
+        if settings.COMMENT_SHARDS:
+            updated = self.recount_sharded(options['batch_size'])
+        else:
+            comments = Comment.objects.filter(
+                news=OuterRef('pk')
+            ).order_by().values('news').annotate(
+                total=Count('pk')
+            ).values('total')
+            updated = News.objects.update(
+                comment_count=Coalesce(Subquery(comments), 0)
+            )
+        invalidate_home_page()
+        if settings.HOME_FEED_SNAPSHOT:
+            build_snapshot()
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено новостей: {updated}')
+        )
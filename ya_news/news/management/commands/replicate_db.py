@@ -0,0 +1,38 @@
+from time import sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from yanews.replicas import replicate
+
+
+class Command(BaseCommand):
+    help = (
+        'Заменяет репликацию при локальном запуске: копирует основную '
+        'SQLite в реплики из NEWS_READ_REPLICAS (NEWS_REPLICA=1) один раз '
+        'или каждые --interval секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между копированиями, с; 0 — скопировать один раз.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.NEWS_READ_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: запустите с NEWS_REPLICA=1.'
+            )
+        source = connections.databases['default']['NAME']
+        while True:
+            for alias in settings.NEWS_READ_REPLICAS:
+                replicate(source, connections.databases[alias]['NAME'])
+            self.stdout.write(
+                f'Скопировано в реплики: '
+                f'{", ".join(settings.NEWS_READ_REPLICAS)}'
+            )
+            if not options['interval']:
+                return
+            sleep(options['interval'])
@@ -0,0 +1,92 @@
+import random
+from datetime import date, timedelta
+from io import StringIO
+from itertools import accumulate
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from news.models import Comment, News
+from news.sharding import bulk_create_comments
+
+User = get_user_model()
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса степенного распределения для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими пользователями, новостями и '
+        'комментариями для нагрузочных замеров. Комментарии распределены '
+        'по новостям по степенному закону: немногие новости получают '
+        'большую часть обсуждения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--news', type=int, default=1000)
+        parser.add_argument(
+            '--comments', type=int, default=20,
+            help='Среднее число комментариев на новость.'
+        )
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        start = perf_counter()
+        password = make_password(None)
+        User.objects.bulk_create(
+            (
+                User(username=f'bench{index}', password=password)
+                for index in range(options['users'])
+            ),
+            batch_size=batch_size
+        )
+        today = date.today()
+        News.objects.bulk_create(
+            (
+                News(
+                    title=f'Новость {index}',
+                    text=f'Текст новости {index}. ' * 20,
+                    date=today - timedelta(days=index),
+                )
+                for index in range(options['news'])
+            ),
+            batch_size=batch_size
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith='bench'
+        ).values_list('pk', flat=True))
+        news_ids = list(News.objects.values_list('pk', flat=True))
+        rnd.shuffle(news_ids)
+        weights = zipf_weights(len(news_ids), options['skew'])
+        total = options['news'] * options['comments']
+        for offset in range(0, total, batch_size):
+            count = min(batch_size, total - offset)
+            bulk_create_comments(
+                Comment(
+                    news_id=news_id,
+                    author_id=rnd.choice(user_ids),
+                    text=f'Комментарий {offset + index}',
+                )
+                for index, news_id in enumerate(
+                    rnd.choices(news_ids, cum_weights=weights, k=count)
+                )
+            )
+        call_command('recount_comments', stdout=StringIO())
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {options["users"]}, новостей: '
+            f'{options["news"]}, комментариев: {total}, '
+            f'{perf_counter() - start:.1f} с'
+        ))
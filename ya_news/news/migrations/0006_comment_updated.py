@@ -0,0 +1,29 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from django.db.models import F
+
+from news.fts import recreate_triggers
+
+
+def fill_updated(apps, schema_editor):
+    Comment = apps.get_model('news', 'Comment')
+    Comment.objects.update(updated=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_triggers),
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_comment_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomeFeedSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('news', models.JSONField(default=list)),
+                ('next_cursor', models.CharField(blank=True, max_length=255)),
+                ('stale', models.BooleanField(default=False)),
+                ('built', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import models
 
 
@@ -8,9 +9,13 @@ class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
-        ordering = ('-date',)
+        ordering = ('-date', '-id')
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -18,10 +23,32 @@ class News(models.Model):
         return self.title
 
 
+class CommentQuerySet(models.QuerySet):
+
+    def with_authors(self, *fields):
+        """
+        Комментарии с именами авторов; из полей загружаются только fields.
+
+        Если комментарии лежат в шардах (news/sharding.py), JOIN с
+        таблицей пользователей невозможен, и авторы догружаются
+        отдельным запросом к основной БД.
+        """
+        fields = (*fields, 'author')
+        if not settings.COMMENT_SHARDS:
+            return self.select_related('author').only(
+                *fields, 'author__username'
+            )
+        return self.only(*fields).prefetch_related(models.Prefetch(
+            'author', queryset=get_user_model().objects.only('username')
+        ))
+
+
 class Comment(models.Model):
+    # В шардах (news/sharding.py) новостей и пользователей нет: внешние
+    # ключи там не проверяются, а каскадное удаление выполняет Django.
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -29,9 +56,43 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
-        ordering = ('created',)
+        ordering = ('created', 'id')
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+
+class ArchiveLoad(models.Model):
+    """Сколько объектов архива уже загружено командой load_news_archive."""
+    source = models.CharField(max_length=255, unique=True)
+    objects_loaded = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.source}: {self.objects_loaded}'
+
+
+class HomeFeedSnapshot(models.Model):
+    """
+    Готовая первая страница ленты новостей, см. news/feed.py.
+
+    Хранится одной строкой: поля новостей в JSON и курсор
+    следующей страницы.
+    """
+    news = models.JSONField(default=list)
+    next_cursor = models.CharField(max_length=255, blank=True)
+    stale = models.BooleanField(default=False)
+    built = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Снимок ленты от {self.built}'
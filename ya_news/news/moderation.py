@@ -0,0 +1,170 @@
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def _node_pattern(node):
+    alternatives = [
+        re.escape(char) + _node_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1:
+        pattern = alternatives[0]
+    else:
+        pattern = '(?:' + '|'.join(alternatives) + ')'
+    if '' in node:
+        pattern = f'(?:{pattern})?'
+    return pattern
+
+
+def compile_words(words):
+    """
+    Собирает слова в одно регулярное выражение по префиксному дереву.
+
+    Общие префиксы слов не повторяются в альтернативах, поэтому в каждой
+    позиции текста проверяется не весь список, а одна ветка дерева.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    if not trie:
+        return None
+    return re.compile(_node_pattern(trie))
+
+
+def read_words(path):
+    """Читает слова из файла: по одному в строке, # — комментарий."""
+    with open(path, encoding='utf-8') as file:
+        return [
+            line.strip().lower() for line in file
+            if line.strip() and not line.lstrip().startswith('#')
+        ]
+
+
+def read_words_or_warn(path):
+    """Слова из файла или None, если файл не читается (с предупреждением)."""
+    try:
+        return read_words(path)
+    except OSError as error:
+        logger.warning(
+            'Файл запрещённых слов недоступен, используется встроенный '
+            'список: %s', error
+        )
+        return None
+
+
+class BadWordsFilter:
+    """
+    Поиск запрещённых слов в тексте без учёта регистра.
+
+    Слова из файла path, если он задан, читаются один раз при создании.
+    Конструктор (words, path) общий для всех фильтров BAD_WORDS_FILTER.
+    """
+
+    def __init__(self, words=(), path=None):
+        if path is not None:
+            words = (*words, *(read_words_or_warn(path) or ()))
+        self.load(words)
+
+    def load(self, words):
+        words = {word.lower() for word in words if word}
+        self.pattern = compile_words(words)
+        self.size = len(words)
+
+    def find(self, text):
+        """Возвращает первое найденное запрещённое слово или None."""
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(text.lower())
+        return match.group() if match else None
+
+
+MISSING = object()
+
+
+class FileBadWordsFilter(BadWordsFilter):
+    """
+    Фильтр, дополняющий слова списком из файла.
+
+    Файл перечитывается при изменении времени модификации,
+    перезапуск процесса не нужен. Пока файла нет, действует только
+    встроенный список слов.
+    """
+
+    def __init__(self, words=(), path=None):
+        self.base_words = tuple(words)
+        self.path = path
+        self.mtime = None
+        self.lock = threading.Lock()
+        super().__init__(words)
+        self.reload()
+
+    def reload(self, force=False):
+        if self.path is None:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = MISSING
+        if mtime == self.mtime and not force:
+            return
+        with self.lock:
+            if mtime != self.mtime or force:
+                words = None
+                if mtime is not MISSING:
+                    words = read_words_or_warn(self.path)
+                elif self.mtime is not MISSING:
+                    logger.warning(
+                        'Файл запрещённых слов %s не найден, используется '
+                        'встроенный список.', self.path
+                    )
+                if words is None:
+                    mtime = MISSING
+                self.load(self.base_words + tuple(words or ()))
+                self.mtime = mtime
+
+    def find(self, text):
+        self.reload()
+        return super().find(text)
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_bad_words_filter(words=()):
+    """
+    Фильтр из настройки BAD_WORDS_FILTER, собранный один раз на процесс.
+
+    Слова берутся из аргумента и из файла BAD_WORDS_FILE, если он задан.
+    """
+    global _filter
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                engine = import_string(settings.BAD_WORDS_FILTER)
+                _filter = engine(words, path=settings.BAD_WORDS_FILE)
+    return _filter
+
+
+@receiver(setting_changed)
+def reset_bad_words_filter(setting=None, **kwargs):
+    if setting not in (None, 'BAD_WORDS_FILTER', 'BAD_WORDS_FILE'):
+        return
+    global _filter
+    with _filter_lock:
+        _filter = None
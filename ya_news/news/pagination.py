@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, prefetch_related_objects
+from django.http import Http404
+
+
+class KeysetPage:
+    """Страница, полученная курсорной пагинацией."""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Курсорная (keyset) пагинация по сортировке queryset.
+
+    Вместо OFFSET следующая страница выбирается условием на значения
+    ключей сортировки последнего объекта, поэтому глубокие страницы
+    отдаются так же быстро, как первая. Последний ключ сортировки
+    должен быть уникальным, например id.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = tuple(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        self.fields = [
+            queryset.model._meta.get_field(key.lstrip('-'))
+            for key in self.keys
+        ]
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        token = base64.urlsafe_b64encode(json.dumps(values).encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (
+            binascii.Error, TypeError, ValueError, ValidationError
+        ) as error:
+            raise Http404('Неверный курсор страницы.') from error
+
+    def _after(self, values):
+        """Условие «строго после» значений ключей в порядке сортировки."""
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            step = Q(**{f'{key.lstrip("-")}__{lookup}': values[index]})
+            for prev_key, prev_value in zip(self.keys, values[:index]):
+                step &= Q(**{prev_key.lstrip('-'): prev_value})
+            condition |= step
+        first_key = self.keys[0]
+        first_lookup = 'lte' if first_key.startswith('-') else 'gte'
+        bound = Q(**{f'{first_key.lstrip("-")}__{first_lookup}': values[0]})
+        return bound & condition
+
+    def after(self, cursor=None):
+        """Объекты queryset, идущие после курсора (все, если его нет)."""
+        if not cursor:
+            return self.queryset
+        return self.queryset.filter(self._after(self.decode_cursor(cursor)))
+
+    def get_page(self, cursor=None):
+        queryset = self.after(cursor)
+        object_list = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return KeysetPage(object_list, next_cursor)
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Объекты queryset списками по chunk_size.
+
+    Строки читаются курсором через iterator(), поэтому в памяти не больше
+    одного списка. iterator() пропускает prefetch_related, и связанные
+    объекты догружаются для каждого списка отдельно.
+    """
+    lookups = queryset._prefetch_related_lookups
+    objects = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            return
+        if lookups:
+            prefetch_related_objects(chunk, *lookups)
+        yield chunk
+
+
+class KeysetPaginationMixin:
+    """Подменяет пагинацию ListView на курсорную."""
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_next()
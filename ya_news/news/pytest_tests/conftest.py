@@ -1,10 +1,14 @@
 from datetime import datetime, timedelta
+from io import StringIO
 
 import pytest
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
 from django.urls import reverse
 from django.utils import timezone
 
+from news.cache import get_cache, reset_stats
 from news.forms import BAD_WORDS
 from news.models import Comment, News
 
@@ -13,6 +17,16 @@ TITLE = 'Заголовок'
 TEXT = 'Текст'
 TEXT_COMMENT = 'Текст комментария'
 NEW_COMMENT_TEXT = 'Новый текст комментария'
+COMMENTS_PER_NEWS = 50
+# Бюджет времени на тест представления, см. маркер max_ms.
+VIEW_MAX_MS = 500
+
+
+@pytest.fixture(autouse=True)
+def clear_news_cache():
+    """Кэш не переживает тестовую транзакцию, поэтому чистим его."""
+    get_cache().clear()
+    reset_stats()
 
 
 @pytest.fixture
@@ -39,6 +53,7 @@ def comment(news, author):
         author=author,
         text=TEXT_COMMENT
     )
+    call_command('recount_comments', stdout=StringIO())
     return comment
 
 
@@ -82,6 +97,17 @@ def comments(news, author):
         comments.save()
 
 
+@pytest.fixture
+def many_comments(all_news, author):
+    """Много комментариев к каждой новости на главной странице."""
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for news in News.objects.all()
+        for index in range(COMMENTS_PER_NEWS)
+    )
+    call_command('recount_comments', stdout=StringIO())
+
+
 @pytest.fixture
 def comment_form_data():
     return {
@@ -103,3 +129,22 @@ def bad_words_data():
 @pytest.fixture
 def detail_url(news):
     return reverse('news:detail', args=(news.id,))
+
+
+@pytest.fixture
+def comment_shards(settings, tmp_path):
+    """Два шарда комментариев — временные файлы SQLite."""
+    aliases = ['shard_0', 'shard_1']
+    settings.COMMENT_SHARDS = aliases
+    for alias in aliases:
+        connections.databases[alias] = {
+            'ENGINE': 'yanews.sqlite_backend',
+            'NAME': tmp_path / f'{alias}.sqlite3',
+            'FOREIGN_KEYS': False,
+        }
+        call_command('migrate', database=alias, verbosity=0)
+    yield aliases
+    for alias in aliases:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
@@ -1,10 +1,26 @@
+import tracemalloc
+from http import HTTPStatus
+from io import StringIO
+
 import pytest
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-pytestmark = pytest.mark.django_db
+from .conftest import (
+    COMMENTS_PER_NEWS, NEW_COMMENT_TEXT, TEXT, TEXT_COMMENT, TITLE,
+    VIEW_MAX_MS
+)
+from news import feed
+from news.models import Comment, HomeFeedSnapshot, News
+
+pytestmark = [pytest.mark.django_db, pytest.mark.max_ms(VIEW_MAX_MS)]
 
 
+@pytest.mark.max_queries(1)
 def test_news_count(all_news, home_url, client):
     """Количество новостей на главной странице — не более 10."""
     response = client.get(home_url)
@@ -13,6 +29,7 @@ def test_news_count(all_news, home_url, client):
     assert news_count == settings.NEWS_COUNT_ON_HOME_PAGE
 
 
+@pytest.mark.max_queries(1)
 def test_news_order(all_news, home_url, client):
     """Новости отсортированы от самой свежей к самой старой."""
     response = client.get(home_url)
@@ -22,6 +39,89 @@ def test_news_order(all_news, home_url, client):
     assert all_dates == sorted_dates
 
 
+@pytest.mark.max_queries(1)
+def test_home_page_queries_do_not_depend_on_comments(
+        many_comments, home_url, client, django_assert_num_queries
+):
+    """
+    Главная страница выполняет один запрос к БД
+
+    и не загружает комментарии, сколько бы их ни было.
+    """
+    with django_assert_num_queries(1) as captured:
+        response = client.get(home_url)
+    assert 'news_comment' not in captured.captured_queries[0]['sql']
+    for news in response.context['object_list']:
+        assert news.comment_count == COMMENTS_PER_NEWS
+    assert f'Комментариев: {COMMENTS_PER_NEWS}' in response.content.decode()
+
+
+@pytest.mark.max_queries(1)
+def test_home_page_cached_for_anonymous(
+        all_news, home_url, client, django_assert_num_queries
+):
+    """Повторный запрос главной страницы анонимом не обращается к БД."""
+    first_response = client.get(home_url)
+    with django_assert_num_queries(0):
+        response = client.get(home_url)
+    assert response.content == first_response.content
+    stats = client.get(reverse('news:cache_stats')).json()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+@pytest.mark.max_queries(24)
+def test_home_page_cache_invalidated_by_comment(
+        news, home_url, client, author_client, detail_url, comment_form_data
+):
+    """Новый комментарий сбрасывает кэш главной страницы и карточки."""
+    assert 'Комментариев' not in client.get(home_url).content.decode()
+    author_client.get(home_url)
+    author_client.post(detail_url, data=comment_form_data)
+    assert 'Комментариев: 1' in client.get(home_url).content.decode()
+    assert 'Комментариев: 1' in author_client.get(home_url).content.decode()
+
+
+@pytest.mark.max_queries(3)
+def test_news_next_page_by_cursor(all_news, home_url, client):
+    """Следующая страница новостей открывается по курсору без повторов."""
+    first_page = client.get(home_url).context['page_obj']
+    assert first_page.has_next()
+    response = client.get(home_url, {'cursor': first_page.next_cursor})
+    second_page = response.context['page_obj']
+    assert not second_page.has_next()
+    all_ids = [news.id for news in first_page] + [
+        news.id for news in second_page
+    ]
+    assert sorted(all_ids) == sorted(news.id for news in News.objects.all())
+
+
+@pytest.mark.max_queries(0)
+@pytest.mark.parametrize('cursor', ('мусор', 'WyJ4Il0', '!!!'))
+def test_invalid_cursor(home_url, client, cursor):
+    """Неверный курсор приводит к ошибке 404."""
+    response = client.get(home_url, {'cursor': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.max_queries(6)
+def test_comments_paginated_by_cursor(
+        news, comments, detail_url, client, settings
+):
+    """Комментарии на странице новости разбиты на страницы по курсору."""
+    settings.COMMENTS_COUNT_ON_NEWS_PAGE = 1
+    first_page = client.get(detail_url).context['comments']
+    assert len(first_page) == 1
+    response = client.get(detail_url, {'cursor': first_page.next_cursor})
+    second_page = response.context['comments']
+    assert len(second_page) == 1
+    first_comment, = first_page
+    second_comment, = second_page
+    assert first_comment.created < second_comment.created
+    assert not second_page.has_next()
+
+
+@pytest.mark.max_queries(5)
 def test_comments_order(news, comments, client):
     """
     Комментарии на странице отдельной новости отсортированы
@@ -36,6 +136,7 @@ def test_comments_order(news, comments, client):
     assert comments[0].created < comments[1].created
 
 
+@pytest.mark.max_queries(5)
 @pytest.mark.parametrize(
     'parametrized_client, expected_status',
     (
@@ -52,3 +153,302 @@ def test_pages_contains_form(news, parametrized_client, expected_status):
     url = reverse('news:detail', args=(news.id,))
     response = parametrized_client.get(url)
     assert ('form' in response.context) is expected_status
+
+
+@pytest.mark.max_queries(4)
+def test_search_finds_news_and_comments(news, comment, client):
+    """Поиск находит новости по заголовку и тексту и комментарии."""
+    search_url = reverse('news:search')
+    response = client.get(search_url, {'q': TITLE.upper()})
+    assert list(response.context['page_obj']) == [('news', news)]
+    response = client.get(search_url, {'q': TEXT_COMMENT})
+    assert list(response.context['page_obj']) == [('comment', comment)]
+
+
+@pytest.mark.max_queries(6)
+def test_search_index_follows_changes(news, client):
+    """Индекс обновляется при изменении и удалении новости."""
+    search_url = reverse('news:search')
+    news.title = 'Сенсация'
+    news.save()
+    response = client.get(search_url, {'q': 'сенсация'})
+    assert list(response.context['page_obj']) == [('news', news)]
+    news.delete()
+    response = client.get(search_url, {'q': 'сенсация'})
+    assert not response.context['page_obj'].object_list
+
+
+@pytest.mark.max_queries(5)
+def test_search_ranked_and_paginated(all_news, client, settings):
+    """Результаты отсортированы по релевантности и разбиты на страницы."""
+    settings.SEARCH_RESULTS_ON_PAGE = 5
+    best = all_news[-1]
+    News.objects.filter(title=best.title).update(title='Сенсация сенсация')
+    search_url = reverse('news:search')
+    first_page = client.get(search_url, {'q': TEXT}).context['page_obj']
+    assert len(first_page) == 5 and first_page.has_next()
+    response = client.get(search_url, {'q': f'{TEXT} сенсация'})
+    kind, found = response.context['page_obj'].object_list[0]
+    assert found.title == 'Сенсация сенсация'
+
+
+@pytest.mark.max_queries(1)
+@pytest.mark.parametrize('query', ('"', 'NEAR(', '*', 'title:'))
+def test_search_ignores_query_syntax(news, client, query):
+    """Операторы FTS5 в запросе не приводят к ошибке."""
+    response = client.get(reverse('news:search'), {'q': query})
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.max_queries(10)
+def test_comments_queries_do_not_depend_on_count(
+        news, author, author_client, detail_url, settings,
+        django_assert_max_num_queries
+):
+    """
+    Страница новости выполняет одинаковое число запросов
+
+    при любом количестве комментариев: автор и признак is_mine
+    приходят тем же запросом, что и сами комментарии.
+    """
+    settings.COMMENTS_COUNT_ON_NEWS_PAGE = COMMENTS_PER_NEWS
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index in range(COMMENTS_PER_NEWS)
+    )
+    with django_assert_max_num_queries(5):
+        response = author_client.get(detail_url)
+    comments = response.context['comments']
+    assert len(comments) == COMMENTS_PER_NEWS
+    assert all(comment.is_mine for comment in comments)
+
+
+@pytest.mark.max_queries(8)
+def test_comment_is_mine_only_for_author(
+        comment, detail_url, client, admin_client
+):
+    """Ссылки на правку комментария видит только его автор."""
+    edit_url = reverse('news:edit', args=(comment.id,))
+    for parametrized_client in (client, admin_client):
+        response = parametrized_client.get(detail_url)
+        found, = response.context['comments']
+        assert found.is_mine is False
+        assert edit_url not in response.content.decode()
+
+
+@pytest.mark.max_queries(40)
+def test_detail_not_modified(
+        comment, detail_url, author_client, comment_form_data
+):
+    """
+    Страница новости с совпадающим ETag отдаётся ответом 304
+
+    без рендеринга, а новый или изменённый комментарий меняет ETag.
+    """
+    etag = author_client.get(detail_url)['ETag']
+    response = author_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not response.templates
+    assert not response.content
+    comment.text = NEW_COMMENT_TEXT
+    comment.save()
+    response = author_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    etag = response['ETag']
+    author_client.post(detail_url, data=comment_form_data)
+    response = author_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.max_queries(14)
+def test_home_not_modified(
+        news, home_url, author_client, django_assert_num_queries
+):
+    """
+    Лента с совпадающим ETag отдаётся ответом 304; аноним получает его
+
+    без запросов к БД, а ETag у разных пользователей разный.
+    """
+    client = Client()
+    etag = client.get(home_url)['ETag']
+    with django_assert_num_queries(0):
+        response = client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    author_etag = author_client.get(home_url)['ETag']
+    assert author_etag != etag
+    response = author_client.get(home_url, HTTP_IF_NONE_MATCH=author_etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    News.objects.create(title=TITLE, text=TEXT)
+    response = author_client.get(home_url, HTTP_IF_NONE_MATCH=author_etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.max_queries(20)
+def test_home_etag_follows_moved_comment(
+        all_news, comment, home_url, author_client
+):
+    """
+    Перенос комментария к другой новости и правка заголовка меняют ETag
+
+    ленты, хотя число новостей и сумма комментариев остаются прежними.
+    """
+    etag = author_client.get(home_url)['ETag']
+    other = News.objects.exclude(pk=comment.news_id).first()
+    comment.news = other
+    comment.save()
+    response = author_client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    etag = response['ETag']
+    other.title = NEW_COMMENT_TEXT
+    other.save()
+    response = author_client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.max_queries(20)
+def test_home_etag_sees_other_processes(
+        all_news, home_url, author_client
+):
+    """
+    Изменение ленты, о котором не знает кэш этого процесса (запись
+
+    из другого процесса, здесь — update без сигналов), меняет ETag
+    ленты у пользователя.
+    """
+    etag = author_client.get(home_url)['ETag']
+    News.objects.filter(pk=News.objects.first().pk).update(title=TITLE)
+    response = author_client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def home_page_news(client, home_url):
+    """Новости ленты и признак того, что их выбирали из news_news."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(home_url)
+    live = any(
+        '"news_news"."title"' in query['sql']
+        for query in context.captured_queries
+    )
+    return list(response.context['object_list']), live
+
+
+@override_settings(HOME_FEED_SNAPSHOT=True, HOME_FEED_DEBOUNCE=None)
+@pytest.mark.max_queries(20)
+def test_home_page_from_snapshot(all_news, home_url, author_client):
+    """Лента берётся из снимка и совпадает с живым запросом."""
+    expected = list(News.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE])
+    news, live = home_page_news(author_client, home_url)
+    assert live
+    assert HomeFeedSnapshot.objects.exists()
+    news, live = home_page_news(author_client, home_url)
+    assert not live
+    assert news == expected
+    assert [item.date for item in news] == [item.date for item in expected]
+
+
+@override_settings(HOME_FEED_SNAPSHOT=True, HOME_FEED_DEBOUNCE=None)
+@pytest.mark.max_queries(40)
+def test_snapshot_follows_comments(
+        news, home_url, author_client, detail_url, comment_form_data,
+        django_capture_on_commit_callbacks
+):
+    """
+    Новый комментарий обновляет счётчик в снимке; устаревший снимок
+
+    при HOME_FEED_FALLBACK заменяется живым запросом.
+    """
+    home_page_news(author_client, home_url)
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(detail_url, data=comment_form_data)
+    [item], live = home_page_news(author_client, home_url)
+    assert not live
+    assert item.comment_count == 1
+    HomeFeedSnapshot.objects.update(stale=True)
+    with override_settings(HOME_FEED_FALLBACK=True):
+        assert home_page_news(author_client, home_url)[1]
+    assert not home_page_news(author_client, home_url)[1]
+
+
+@override_settings(HOME_FEED_SNAPSHOT=True, HOME_FEED_DEBOUNCE=60)
+@pytest.mark.max_queries(30)
+def test_snapshot_rebuild_resets_page_cache(
+        news, home_url, author_client, detail_url, comment_form_data,
+        django_capture_on_commit_callbacks
+):
+    """
+    Страница ленты, закэшированная до пересборки снимка, сбрасывается
+
+    пересборкой, и аноним видит новый счётчик комментариев.
+    """
+    call_command('rebuild_home_feed', stdout=StringIO())
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(detail_url, data=comment_form_data)
+    client = Client()
+    assert client.get(home_url).context['object_list'][0].comment_count == 0
+    feed._rebuilder.timer.cancel()
+    feed._rebuilder.flush()
+    assert client.get(home_url).context['object_list'][0].comment_count == 1
+
+
+def add_comments(news, author, count):
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'{TEXT_COMMENT} {index:05}')
+        for index in range(count)
+    )
+
+
+def stream_peak(client, url):
+    """Пик памяти (байт) на запрос и чтение потокового ответа."""
+    tracemalloc.start()
+    try:
+        response = client.get(url)
+        assert response.streaming
+        for _ in response.streaming_content:
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.max_queries(12)
+def test_detail_streaming(news, author, detail_url, author_client, settings):
+    """
+    Потоковая страница новости: сначала новость, затем все комментарии
+
+    по порядку частями, затем форма комментария.
+    """
+    settings.NEWS_DETAIL_STREAMING = True
+    settings.COMMENTS_STREAM_CHUNK_SIZE = 7
+    response = author_client.get(detail_url)
+    assert response.status_code == HTTPStatus.OK
+    assert response.streaming
+    assert 'csrftoken' in response.cookies
+    chunks = [chunk.decode() for chunk in response.streaming_content]
+    assert TITLE in chunks[0] and TEXT_COMMENT not in chunks[0]
+    assert 'Здесь никто ничего не написал' in ''.join(chunks)
+
+    add_comments(news, author, 20)
+    chunks = [
+        chunk.decode()
+        for chunk in author_client.get(detail_url).streaming_content
+    ]
+    assert len(chunks) == 2 + 3
+    content = ''.join(chunks)
+    texts = [f'{TEXT_COMMENT} {index:05}' for index in range(20)]
+    positions = [content.index(text) for text in texts]
+    assert positions == sorted(positions)
+    assert 'Следующие комментарии' not in content
+    assert content.index(texts[-1]) < content.index('Оставить комментарий')
+
+
+@pytest.mark.max_ms(20000)
+def test_detail_streaming_memory(news, author, detail_url, client, settings):
+    """Пик памяти потоковой страницы почти не растёт с числом комментариев."""
+    settings.NEWS_DETAIL_STREAMING = True
+    chunk_size = settings.COMMENTS_STREAM_CHUNK_SIZE
+    add_comments(news, author, chunk_size * 2)
+    stream_peak(client, detail_url)
+    small = stream_peak(client, detail_url)
+    add_comments(news, author, chunk_size * 18)
+    large = stream_peak(client, detail_url)
+    assert large < small * 1.5, (small, large)
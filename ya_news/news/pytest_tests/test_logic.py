@@ -1,11 +1,29 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
+from django.conf import settings as django_settings
+from django.core.management import call_command
+from django.db import (
+    IntegrityError, OperationalError, connection, connections, transaction
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from pytest_django.asserts import assertFormError, assertRedirects
 
-from news.forms import WARNING
-from news.models import Comment
+from .conftest import TEXT, TITLE, USERNAME
+from news import ingest, sharding
+from news.forms import BAD_WORDS, WARNING
+from news.models import ArchiveLoad, Comment, News
+from news.search import search
+from yanews import settings_module
+from yanews.replicas import replicate
+from yanews.sqlite import set_sqlite_pragmas
 
 
 def test_user_can_create_comment(
@@ -21,6 +39,8 @@ def test_user_can_create_comment(
         text=comment_form_data['text'],
         news=news, author=author)
     assert new_comment
+    news.refresh_from_db()
+    assert news.comment_count == 1
 
 
 @pytest.mark.django_db
@@ -51,8 +71,63 @@ def test_user_cant_use_bad_words(bad_words_data, author_client, detail_url):
     assert comments_count == 0
 
 
+def test_bad_words_file_reloaded(
+        author_client, detail_url, settings, tmp_path
+):
+    """Слова из файла подхватываются при его изменении без перезапуска."""
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('# стоп-слова\nбука\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = words_file
+    response = author_client.post(detail_url, data={'text': 'Ты Бука!'})
+    error, = response.context['form'].errors.as_data()['text']
+    assert error.params == {'word': 'бука'}
+    words_file.write_text('злюка\n', encoding='utf-8')
+    os.utime(words_file, ns=(0, 0))
+    response = author_client.post(detail_url, data={'text': 'Ты бука!'})
+    assert Comment.objects.count() == 1
+    response = author_client.post(detail_url, data={'text': 'Ты злюка!'})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+
+
+def test_bad_words_file_missing(
+        author_client, detail_url, settings, tmp_path, caplog
+):
+    """
+    Без файла слов действует встроенный список, а комментарии пишутся;
+
+    появившийся файл подхватывается.
+    """
+    words_file = tmp_path / 'bad_words.txt'
+    settings.BAD_WORDS_FILE = words_file
+    response = author_client.post(detail_url, data={'text': 'Ты бука!'})
+    assert Comment.objects.count() == 1
+    assert 'не найден' in caplog.text
+    response = author_client.post(
+        detail_url, data={'text': f'Ты {BAD_WORDS[0]}!'}
+    )
+    assertFormError(response, form='form', field='text', errors=WARNING)
+    words_file.write_text('бука\n', encoding='utf-8')
+    response = author_client.post(detail_url, data={'text': 'Ты бука!'})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+
+
+def test_static_bad_words_filter(
+        author_client, detail_url, settings, tmp_path
+):
+    """Любой фильтр BAD_WORDS_FILTER принимает words и path."""
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('бука\n', encoding='utf-8')
+    settings.BAD_WORDS_FILTER = 'news.moderation.BadWordsFilter'
+    settings.BAD_WORDS_FILE = words_file
+    response = author_client.post(detail_url, data={'text': 'Ты бука!'})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+    settings.BAD_WORDS_FILE = None
+    author_client.post(detail_url, data={'text': 'Ты бука!'})
+    assert Comment.objects.count() == 1
+
+
 def test_author_can_delete_comment(
-        author_client, comment_id_for_args, detail_url
+        author_client, comment_id_for_args, detail_url, news
 ):
     """Авторизованный пользователь может удалять свои комментарии."""
     url = reverse('news:delete', args=comment_id_for_args)
@@ -63,6 +138,8 @@ def test_author_can_delete_comment(
     assertRedirects(response, url_to_comments)
     comments_count_after = Comment.objects.count()
     assert comments_count != comments_count_after
+    news.refresh_from_db()
+    assert news.comment_count == 0
 
 
 @pytest.mark.django_db
@@ -104,3 +181,387 @@ def test_user_cant_edit_comment_of_another_user(
     assert response.status_code == HTTPStatus.NOT_FOUND
     comment_from_db = Comment.objects.get(id=comment.id)
     assert comment.text == comment_from_db.text
+
+
+@pytest.mark.django_db
+def test_recount_comments_command(news, comments):
+    """Команда recount_comments восстанавливает счётчик комментариев."""
+    News.objects.update(comment_count=0)
+    call_command('recount_comments', stdout=StringIO())
+    news.refresh_from_db()
+    assert news.comment_count == Comment.objects.filter(news=news).count()
+
+
+def write_archive(path, author, news_count, comments_per_news):
+    objects = []
+    for news_pk in range(1, news_count + 1):
+        objects.append({
+            'model': 'news.news',
+            'pk': news_pk,
+            'fields': {'title': f'Новость {news_pk}', 'text': TEXT,
+                       'date': '2022-11-01'},
+        })
+        objects += [
+            {
+                'model': 'news.comment',
+                'fields': {'news': news_pk, 'author': author.pk,
+                           'text': TEXT, 'created': '2022-11-02T10:00:00Z'},
+            }
+            for _ in range(comments_per_news)
+        ]
+    path.write_text(json.dumps(objects, indent=2), encoding='utf-8')
+    return len(objects)
+
+
+@pytest.mark.django_db
+def test_load_news_archive(author, tmp_path):
+    """Архив загружается пачками с исходными датами комментариев."""
+    archive = tmp_path / 'archive.json'
+    write_archive(archive, author, news_count=4, comments_per_news=3)
+    call_command(
+        'load_news_archive', archive, batch_size=5, stdout=StringIO()
+    )
+    assert News.objects.count() == 4
+    assert Comment.objects.count() == 12
+    assert not Comment.objects.exclude(created__year=2022).exists()
+    assert set(News.objects.values_list('comment_count', flat=True)) == {3}
+
+
+@pytest.mark.django_db
+def test_load_news_archive_resumes(author, tmp_path):
+    """Повторный запуск продолжает с последней сохранённой пачки."""
+    archive = tmp_path / 'archive.json'
+    total = write_archive(archive, author, news_count=2, comments_per_news=2)
+    News.objects.create(pk=1, title='Новость 1', text=TEXT)
+    Comment.objects.create(news_id=1, author=author, text=TEXT)
+    ArchiveLoad.objects.create(source=str(archive.resolve()), objects_loaded=2)
+    call_command('load_news_archive', archive, stdout=StringIO())
+    assert News.objects.count() == 2
+    assert Comment.objects.count() == 4
+    assert ArchiveLoad.objects.get().objects_loaded == total
+
+
+@pytest.mark.django_db
+def test_load_news_archive_into_shards(comment_shards, author, tmp_path):
+    """При шардировании комментарии архива попадают в шарды новостей."""
+    archive = tmp_path / 'archive.json'
+    write_archive(archive, author, news_count=4, comments_per_news=3)
+    call_command(
+        'load_news_archive', archive, batch_size=5, stdout=StringIO()
+    )
+    assert not Comment.objects.using('default').exists()
+    for news in News.objects.all():
+        comments = sharding.comments_for_news(news.pk)
+        assert comments.count() == news.comment_count == 3
+        for comment in comments:
+            assert sharding.shard_for_comment(comment.pk) == (
+                comment._state.db
+            )
+
+
+@pytest.mark.django_db
+def test_seed_benchmark(django_user_model):
+    """seed_benchmark создаёт заданный объём данных со счётчиками."""
+    call_command(
+        'seed_benchmark', users=3, news=10, comments=5, stdout=StringIO()
+    )
+    assert django_user_model.objects.count() == 3
+    assert News.objects.count() == 10
+    assert Comment.objects.count() == 50
+    counts = list(News.objects.values_list('comment_count', flat=True))
+    assert sum(counts) == 50
+    assert max(counts) > 5
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_applied(settings):
+    """PRAGMA из SQLITE_PRAGMAS выполняются для соединения."""
+    settings.SQLITE_PRAGMAS = {'busy_timeout': 1234, 'cache_size': -2048}
+    set_sqlite_pragmas(sender=None, connection=connection)
+    with connection.cursor() as cursor:
+        assert cursor.execute('PRAGMA busy_timeout').fetchone() == (1234,)
+        assert cursor.execute('PRAGMA cache_size').fetchone() == (-2048,)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_transactions_begin_immediate(author, news):
+    """Транзакция atomic() сразу берёт блокировку записи SQLite."""
+    with CaptureQueriesContext(connection) as context:
+        with transaction.atomic():
+            Comment.objects.create(news=news, author=author, text=TEXT)
+    assert context.captured_queries[0]['sql'] == 'BEGIN IMMEDIATE'
+
+
+def test_suite_runs_under_xdist():
+    """
+    Тесты с БД проходят в воркерах pytest-xdist, как в run_tests.sh:
+
+    у каждого воркера своя тестовая БД.
+    """
+    env = {
+        name: value for name, value in os.environ.items()
+        if not name.startswith(('PYTEST_', 'DJANGO_SETTINGS_MODULE'))
+    }
+    result = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-n', '2',
+         'news/pytest_tests/test_routes.py', '-k', 'not xdist'],
+        cwd=django_settings.BASE_DIR, env=env,
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout[-2000:]
+
+
+def test_settings_profile_from_environment(monkeypatch):
+    """Профиль настроек выбирается переменной окружения DJANGO_ENV."""
+    monkeypatch.delenv('DJANGO_ENV', raising=False)
+    assert settings_module() == 'yanews.settings'
+    monkeypatch.setenv('DJANGO_ENV', 'prod')
+    assert settings_module() == 'yanews.settings_prod'
+    monkeypatch.setenv('DJANGO_ENV', 'staging')
+    with pytest.raises(RuntimeError):
+        settings_module()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_comment(
+        settings, tmp_path, author_client, news, comment_form_data,
+        detail_url
+):
+    """Фоновый поток записывает комментарий, stop дописывает очередь."""
+    settings.COMMENT_WRITE_BEHIND = True
+    settings.COMMENT_QUEUE_JOURNAL = tmp_path
+    response = author_client.post(detail_url, data=comment_form_data)
+    assertRedirects(response, f'{detail_url}#comments')
+    ingest.get_comment_queue().stop()
+    assert Comment.objects.filter(news=news).count() == 1
+    assert not list(tmp_path.glob('comments-*.jsonl'))
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_comment_queue_backpressure(author, news):
+    """Переполненная очередь не теряет комментарий, а пишет его сразу."""
+    comment_queue = ingest.CommentQueue(maxsize=1, put_timeout=0)
+    assert comment_queue.submit(Comment(news=news, author=author, text='1'))
+    assert not comment_queue.submit(
+        Comment(news=news, author=author, text='2')
+    )
+    assert Comment.objects.count() == 1
+    comment_queue.stop()
+    assert Comment.objects.count() == 2
+    news.refresh_from_db()
+    assert news.comment_count == 2
+
+
+@pytest.mark.django_db
+def test_comment_queue_retries_locked_batch(monkeypatch, author, news):
+    """Пачка, не записанная из-за блокировки, записывается повторно."""
+    write_comments = ingest.write_comments
+    failures = []
+
+    def flaky_write(comments):
+        if not failures:
+            failures.append(1)
+            raise OperationalError('database is locked')
+        return write_comments(comments)
+
+    monkeypatch.setattr(ingest, 'write_comments', flaky_write)
+    monkeypatch.setattr(ingest, 'RETRY_DELAY', 0)
+    comment_queue = ingest.CommentQueue(batch_size=2)
+    for index in range(3):
+        comment_queue.submit(
+            Comment(news=news, author=author, text=f'{index}')
+        )
+    comment_queue.stop()
+    assert failures
+    assert Comment.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_comment_write_retries_busy_errors(
+        monkeypatch, tmp_path, author, news
+):
+    """
+    «database is locked» повторяется до успеха, другие ошибки — нет;
+
+    комментарий, отвергнутый БД, уходит в dead letter.
+    """
+    write_comments = ingest.write_comments
+    errors = []
+
+    def failing_write(comments):
+        if errors:
+            error = errors.pop(0)
+            if error:
+                raise OperationalError(error)
+        return write_comments(comments)
+
+    monkeypatch.setattr(ingest, 'write_comments', failing_write)
+    monkeypatch.setattr(ingest, 'RETRY_DELAY', 0)
+    comment = Comment(news=news, author=author, text=TEXT)
+    errors[:] = ['no such table: news_comment', None]
+    with pytest.raises(OperationalError):
+        ingest.write_with_retry([comment])
+    errors[:] = ['database is locked'] * 20
+    ingest.write_with_retry([comment])
+    assert not errors
+    Comment.objects.all().delete()
+    dead_letter = tmp_path / 'dead_letter.jsonl'
+    comment_queue = ingest.CommentQueue(
+        batch_size=1, journal=ingest.CommentJournal(tmp_path),
+        dead_letter=dead_letter,
+    )
+    errors[:] = ['disk I/O error'] * 2
+    comment_queue.submit(Comment(news=news, author=author, text='1'))
+    comment_queue.submit(Comment(news=news, author=author, text='2'))
+    comment_queue.stop()
+    assert list(Comment.objects.values_list('text', flat=True)) == ['2']
+    records = [json.loads(line) for line in dead_letter.open()]
+    assert [record['text'] for record in records] == ['1']
+    assert records[0]['error'] == 'disk I/O error'
+    assert not list(tmp_path.glob('comments-*.jsonl'))
+
+
+@pytest.mark.django_db
+def test_comment_journal_replays_after_crash(tmp_path, author, news):
+    """Комментарии, не записанные до падения, записываются при старте."""
+    crashed = ingest.CommentQueue(journal=ingest.CommentJournal(tmp_path))
+    for text in ('1', '2', '3'):
+        crashed.submit(Comment(news=news, author=author, text=text))
+    crashed.flush([crashed.queue.get_nowait()])
+    # Процесс упал: очередь потеряна, flock на журнале снят.
+    crashed.journal.file.close()
+    comment_queue = ingest.CommentQueue(
+        journal=ingest.CommentJournal(tmp_path)
+    )
+    comment_queue.replay()
+    assert comment_queue.queue.qsize() == 2
+    comment_queue.stop()
+    assert sorted(
+        Comment.objects.values_list('text', flat=True)
+    ) == ['1', '2', '3']
+    news.refresh_from_db()
+    assert news.comment_count == 3
+    assert not list(tmp_path.glob('comments-*.jsonl'))
+
+
+def test_replicate_copies_database(tmp_path):
+    """replicate копирует основную SQLite в файл реплики."""
+    primary = tmp_path / 'primary.sqlite3'
+    replica = tmp_path / 'replica.sqlite3'
+    with sqlite3.connect(primary) as db:
+        db.execute('CREATE TABLE news (title TEXT)')
+        db.execute("INSERT INTO news VALUES ('Первая')")
+    replicate(primary, replica)
+    with sqlite3.connect(primary) as db:
+        db.execute("INSERT INTO news VALUES ('Вторая')")
+    with sqlite3.connect(replica) as db:
+        assert db.execute('SELECT count(*) FROM news').fetchone() == (1,)
+    replicate(primary, replica)
+    with sqlite3.connect(replica) as db:
+        assert db.execute('SELECT count(*) FROM news').fetchone() == (2,)
+
+
+def test_comment_shard_router(settings, author):
+    """Роутер выбирает шард по новости, связанные модели — в основной БД."""
+    router = sharding.CommentShardRouter()
+    comment = Comment(news_id=3, author=author)
+    assert router.db_for_write(Comment, instance=comment) is None
+    settings.COMMENT_SHARDS = ['shard_0', 'shard_1']
+    assert router.db_for_write(Comment, instance=comment) == 'shard_1'
+    assert router.db_for_read(Comment, instance=News(pk=4)) == 'shard_0'
+    assert router.db_for_read(Comment) is None
+    comment._state.db = 'shard_1'
+    assert router.db_for_read(News, instance=comment) == 'default'
+    assert sharding.shard_for_comment(sharding.SHARD_ID_RANGE) == 'shard_1'
+
+
+@pytest.mark.django_db
+def test_comment_foreign_keys(author):
+    """Без шардов внешние ключи комментария проверяются в БД."""
+    Comment.objects.create(news_id=10 ** 6, author=author, text=TEXT)
+    with pytest.raises(IntegrityError):
+        connection.check_constraints()
+    Comment.objects.all().delete()
+
+
+@pytest.mark.django_db
+def test_sharded_comments_without_foreign_keys(comment_shards, author):
+    """В шардах, где нет новостей, внешние ключи не проверяются."""
+    news = News.objects.create(title=TITLE, text=TEXT)
+    alias = sharding.shard_for_news(news.pk)
+    Comment(news=news, author=author, text=TEXT).save()
+    connections[alias].check_constraints()
+    assert not News.objects.using(alias).exists()
+
+
+@pytest.mark.django_db
+def test_comment_and_count_roll_back_together(
+        comment_shards, author_client, detail_url, news, comment_form_data,
+        monkeypatch
+):
+    """Ошибка при обновлении счётчика откатывает комментарий в шарде."""
+    def failing_update(*args, **kwargs):
+        raise OperationalError('disk I/O error')
+
+    monkeypatch.setattr(
+        News.objects.get_queryset().__class__, 'update', failing_update
+    )
+    with pytest.raises(OperationalError):
+        author_client.post(detail_url, data=comment_form_data)
+    monkeypatch.undo()
+    assert not sharding.comments_for_news(news.pk).exists()
+    author_client.post(detail_url, data=comment_form_data)
+    comment = sharding.comments_for_news(news.pk).get()
+    author_client.post(reverse('news:delete', args=(comment.pk,)))
+    assert not sharding.comments_for_news(news.pk).exists()
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_search_merges_comment_shards(comment_shards, author):
+    """Поиск находит комментарии из каждого шарда и листает их вместе."""
+    for index in range(2):
+        news = News.objects.create(title=f'Новость {index}', text=TEXT)
+        Comment(news=news, author=author, text=f'Редкое слово {index}').save()
+    [(kind, comment)] = search('редкое слово', page=1, per_page=1)
+    page = search('редкое слово', page=2, per_page=1)
+    assert not page.has_next()
+    [(_, other)] = page
+    assert kind == 'comment'
+    assert {comment._state.db, other._state.db} == set(comment_shards)
+
+
+@pytest.mark.django_db
+def test_sharded_comments(comment_shards, author_client, comment_form_data):
+    """Комментарии пишутся в шард своей новости и читаются из него."""
+    all_news = [
+        News.objects.create(title=f'Новость {index}', text=TEXT)
+        for index in range(2)
+    ]
+    for news in all_news:
+        url = reverse('news:detail', args=(news.pk,))
+        author_client.post(url, data=comment_form_data)
+        comment = Comment.objects.using(
+            sharding.shard_for_news(news.pk)
+        ).get(news_id=news.pk)
+        assert sharding.shard_for_comment(comment.pk) == comment._state.db
+        assert news.comment_set.get() == comment
+        response = author_client.get(url)
+        [shown] = response.context['comments']
+        assert shown.author.username == USERNAME
+        assert reverse('news:edit', args=(comment.pk,)) in (
+            response.content.decode()
+        )
+        response = author_client.get(reverse('news:edit', args=(comment.pk,)))
+        assert response.status_code == HTTPStatus.OK
+    news_ids = [news.pk for news in all_news]
+    assert sharding.count_comments(news_ids) == dict.fromkeys(news_ids, 1)
+    response = author_client.get(
+        reverse('news:search'), {'q': comment_form_data['text']}
+    )
+    assert len(response.context['page_obj']) == 2
+    all_news[0].delete()
+    assert sum(sharding.count_comments(news_ids).values()) == 1
@@ -1,15 +1,36 @@
+import asyncio
+import threading
 from http import HTTPStatus
 
 import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory
 from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 
+from .conftest import VIEW_MAX_MS
+from news import views
+from news.cache import get_cache
+from news.models import News
+from yanews import replicas
+from yanews.timing import (
+    BudgetExceeded, RequestTimingMiddleware, get_histograms,
+    get_template_histograms
+)
+
+pytestmark = pytest.mark.max_ms(VIEW_MAX_MS)
+
 
+@pytest.mark.max_queries(3)
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     'name, args',
     (
         ('news:home', None),
+        ('news:cache_stats', None),
+        ('news:search', None),
         ('users:login', None),
         ('users:logout', None),
         ('users:signup', None),
@@ -29,6 +50,7 @@ def test_pages_availability_for_anonymous_user(client, name, args):
     assert response.status_code == HTTPStatus.OK
 
 
+@pytest.mark.max_queries(4)
 @pytest.mark.parametrize(
     'parametrized_client, expected_status',
     (
@@ -57,6 +79,7 @@ def test_availability_for_comment_edit_and_delete(
     assert response.status_code == expected_status
 
 
+@pytest.mark.max_queries(0)
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     'name',
@@ -80,3 +103,158 @@ def test_redirects_for_anonymous_client(
     expected_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+@pytest.mark.max_queries(3)
+@pytest.mark.django_db
+def test_timing_headers_and_histogram(client, news_id_for_args):
+    """В ответ добавляются заголовки с числом запросов и временем."""
+    url = reverse('news:detail', args=news_id_for_args)
+    calls = get_histograms().get('news:detail', {}).get('count', 0)
+    response = client.get(url)
+    assert int(response['X-DB-Queries']) == 3
+    for header in ('X-DB-Time', 'X-Template-Time', 'X-Python-Time'):
+        assert float(response[header]) >= 0
+    assert get_histograms()['news:detail']['count'] == calls + 1
+
+
+@pytest.mark.django_db
+def test_budget_exceeded(client, news_id_for_args, settings):
+    """Превышение бюджета запросов приводит к ошибке в режиме raise."""
+    settings.REQUEST_BUDGETS = {'news:detail': {'queries': 1}}
+    settings.REQUEST_BUDGET_ACTION = 'raise'
+    with pytest.raises(BudgetExceeded):
+        client.get(reverse('news:detail', args=news_id_for_args))
+
+
+@pytest.mark.max_queries(2)
+@pytest.mark.django_db
+def test_template_stats_only_in_debug(client, home_url, settings):
+    """Время рендеринга шаблонов доступно по отладочному адресу."""
+    url = reverse('template_stats')
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND
+    client.get(home_url)
+    assert get_template_histograms()['news/home.html']['count'] >= 1
+    settings.DEBUG = True
+    response = client.get(url)
+    assert response.json()['news/home.html']['count'] >= 1
+
+
+def render(view, request, **kwargs):
+    request.user = AnonymousUser()
+    if asyncio.iscoroutinefunction(view):
+        async def call():
+            return await view(request, **kwargs)
+        response = async_to_sync(call)()
+    else:
+        response = view(request, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    'sync_view, async_view',
+    (
+        (views.NewsList, views.AsyncNewsList),
+        (views.NewsDetailView, views.AsyncNewsDetailView),
+    ),
+)
+def test_async_views_render_like_sync(comment, sync_view, async_view):
+    """Асинхронные NewsList и NewsDetail отдают ту же страницу."""
+    kwargs = {} if sync_view is views.NewsList else {'pk': comment.news_id}
+    expected = render(sync_view.as_view(), RequestFactory().get('/'), **kwargs)
+    get_cache().clear()
+    content = render(
+        async_view.as_view(), AsyncRequestFactory().get('/'), **kwargs
+    )
+    assert asyncio.iscoroutinefunction(async_view.as_view())
+    assert content == expected
+
+
+def test_async_get_runs_outside_shared_thread(monkeypatch):
+    """
+    Асинхронный GET выполняется в пуле потоков, а не в общем потоке,
+
+    где Django выполняет синхронные представления под ASGI.
+    """
+    threads = []
+
+    def get(self, request, *args, **kwargs):
+        threads.append(threading.get_ident())
+        return HttpResponse()
+
+    async def call():
+        shared = await sync_to_async(threading.get_ident)()
+        view = views.AsyncNewsList.as_view()
+        await asyncio.gather(*(
+            view(AsyncRequestFactory().get('/')) for _ in range(2)
+        ))
+        return shared
+
+    monkeypatch.setattr(views.NewsList, 'get', get)
+    shared = async_to_sync(call)()
+    assert len(threads) == 2
+    assert shared not in threads
+
+
+@pytest.mark.django_db
+def test_timing_middleware_counts_async_view_queries(news):
+    """Под ASGI учитываются SQL-запросы, выполненные в sync_to_async."""
+    async def view(request):
+        count = await sync_to_async(News.objects.count)()
+        return HttpResponse(count)
+
+    middleware = RequestTimingMiddleware(view)
+    assert asyncio.iscoroutinefunction(middleware)
+    response = async_to_sync(middleware)(AsyncRequestFactory().get('/'))
+    assert response['X-DB-Queries'] == '1'
+
+
+@pytest.mark.django_db
+@pytest.mark.max_queries(2)
+def test_cached_page_rendered_from_primary(settings, news, client, home_url):
+    """
+    Анонимная страница для кэша строится по основной БД: реплика могла
+
+    ещё не получить запись, которая сбросила кэш.
+    """
+    settings.NEWS_READ_REPLICAS = ['missing_replica']
+    response = client.get(home_url)
+    assert response.status_code == HTTPStatus.OK
+    assert list(response.context['object_list']) == [news]
+
+
+def test_router_reads_news_from_replica(settings, django_user_model):
+    """С реплики читаются только модели news и только в запросе GET."""
+    settings.NEWS_READ_REPLICAS = ['replica']
+    router = replicas.ReplicaRouter()
+    assert router.db_for_read(News) is None
+    token = replicas._replica_reads.set(True)
+    try:
+        assert router.db_for_read(News) == 'replica'
+        assert router.db_for_read(django_user_model) is None
+        assert router.db_for_write(News) == 'default'
+    finally:
+        replicas._replica_reads.reset(token)
+
+
+def test_writer_sticks_to_primary(settings):
+    """После записи пользователь читает с основной БД PIN_SECONDS секунд."""
+    reads = []
+
+    def get_response(request):
+        reads.append(replicas._replica_reads.get())
+        return HttpResponse()
+
+    middleware = replicas.ReplicaMiddleware(get_response)
+    factory = RequestFactory()
+    response = middleware(factory.post('/'))
+    cookie = response.cookies[replicas.PRIMARY_PIN_COOKIE]
+    assert cookie['max-age'] == settings.PRIMARY_PIN_SECONDS
+    middleware(factory.get('/'))
+    factory.cookies[replicas.PRIMARY_PIN_COOKIE] = '1'
+    middleware(factory.get('/'))
+    assert reads == [False, True, False]
+    assert replicas._replica_reads.get() is False
@@ -0,0 +1,144 @@
+import re
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from .models import Comment, News
+from .sharding import shard_for_comment
+
+TOKEN = re.compile(r'\w+')
+
+# Индексы news_news_fts и news_comment_fts создаются миграцией 0005
+# и обновляются триггерами. SQLite удаляет триггеры вместе с таблицей,
+# поэтому миграции, пересоздающие news_news или news_comment, должны
+# создавать их заново (news/fts.py).
+SEARCH_SQL = """
+    SELECT 'news', rowid, bm25(news_news_fts, 10.0, 1.0) AS rank
+    FROM news_news_fts WHERE news_news_fts MATCH %s
+    UNION ALL
+    SELECT 'comment', rowid, bm25(news_comment_fts) AS rank
+    FROM news_comment_fts WHERE news_comment_fts MATCH %s
+    ORDER BY rank
+    LIMIT %s OFFSET %s
+"""
+# При шардировании комментариев (news/sharding.py) индекс комментариев
+# есть в каждом шарде: из основной БД и из каждого шарда берутся первые
+# page * per_page + 1 строк, и они сливаются по rank. Статистика BM25
+# у каждого шарда своя, поэтому ранги шардов сравнимы лишь приближённо.
+NEWS_SEARCH_SQL = """
+    SELECT 'news', rowid, bm25(news_news_fts, 10.0, 1.0) AS rank
+    FROM news_news_fts WHERE news_news_fts MATCH %s
+    ORDER BY rank LIMIT %s
+"""
+COMMENT_SEARCH_SQL = """
+    SELECT 'comment', rowid, bm25(news_comment_fts) AS rank
+    FROM news_comment_fts WHERE news_comment_fts MATCH %s
+    ORDER BY rank LIMIT %s
+"""
+
+
+def build_match(query):
+    """
+    Запрос FTS5 из пользовательской строки: все слова обязательны.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 в тексте
+    не приводили к синтаксическим ошибкам.
+    """
+    return ' '.join(f'"{token}"' for token in TOKEN.findall(query.lower()))
+
+
+class SearchPage:
+    """Страница результатов поиска, отсортированных по BM25."""
+
+    def __init__(self, results, number, has_next):
+        self.object_list = results
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def fetch_rows(alias, sql, params):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def sharded_rows(match, page, per_page):
+    """Строки страницы поиска из основной БД и всех шардов комментариев."""
+    limit = page * per_page + 1
+    rows = fetch_rows(DEFAULT_DB_ALIAS, NEWS_SEARCH_SQL, (match, limit))
+    for alias in settings.COMMENT_SHARDS:
+        rows += fetch_rows(alias, COMMENT_SEARCH_SQL, (match, limit))
+    rows.sort(key=itemgetter(2))
+    return rows[(page - 1) * per_page:limit]
+
+
+def load_comments(pks):
+    """Комментарии по id вместе с новостями и авторами."""
+    if not settings.COMMENT_SHARDS:
+        return Comment.objects.select_related('news', 'author').in_bulk(pks)
+    comments = {}
+    by_shard = defaultdict(list)
+    for pk in pks:
+        by_shard[shard_for_comment(pk)].append(pk)
+    for alias, ids in by_shard.items():
+        comments.update(
+            Comment.objects.using(alias).prefetch_related(
+                'news', 'author'
+            ).in_bulk(ids)
+        )
+    return comments
+
+
+def search(query, page=1, per_page=20):
+    """
+    Ищет по заголовкам и текстам новостей и по комментариям.
+
+    Возвращает SearchPage с парами (тип, объект): 'news' и News
+    или 'comment' и Comment. Комментарии ищутся во всех шардах.
+    """
+    match = build_match(query)
+    if not match:
+        return SearchPage([], page, False)
+    if settings.COMMENT_SHARDS:
+        rows = sharded_rows(match, page, per_page)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SEARCH_SQL,
+                (match, match, per_page + 1, (page - 1) * per_page)
+            )
+            rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    news = News.objects.in_bulk(
+        [pk for kind, pk, _ in rows if kind == 'news']
+    )
+    comments = load_comments(
+        [pk for kind, pk, _ in rows if kind == 'comment']
+    )
+    objects = {'news': news, 'comment': comments}
+    results = [
+        (kind, objects[kind][pk]) for kind, pk, _ in rows
+        if pk in objects[kind]
+    ]
+    return SearchPage(results, page, has_next)
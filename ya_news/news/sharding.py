@@ -0,0 +1,187 @@
+"""
+Шардирование комментариев по id новости.
+
+Включается настройкой COMMENT_SHARDS — списком псевдонимов БД:
+комментарии новости хранятся в COMMENT_SHARDS[news_id % N]. Id
+комментариев в k-м шарде выдаются из диапазона [k * SHARD_ID_RANGE,
+(k + 1) * SHARD_ID_RANGE), поэтому шард комментария находится по его id.
+Новости и пользователи остаются в основной БД, поэтому в шардах
+внешние ключи не проверяются ('FOREIGN_KEYS': False в настройках БД,
+см. yanews/sqlite_backend), а каскадное удаление комментариев в шардах
+выполняют обработчики pre_delete.
+
+news.comment_set и сохранение комментария попадают в нужный шард через
+CommentShardRouter. Запросы без привязки к новости нужно выполнять
+на каждом шарде: см. for_each_shard и count_comments.
+"""
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count
+from django.db.models.signals import post_migrate, pre_delete
+from django.dispatch import receiver
+
+from .models import Comment, News
+
+SHARD_ID_RANGE = 10 ** 12
+
+
+def shard_for_news(news_id):
+    """Шард комментариев новости или None, если шардирование выключено."""
+    shards = settings.COMMENT_SHARDS
+    if not shards:
+        return None
+    return shards[news_id % len(shards)]
+
+
+def shard_for_comment(comment_id):
+    """Шард комментария по диапазону его id."""
+    shards = settings.COMMENT_SHARDS
+    if not shards:
+        return None
+    return shards[min(comment_id // SHARD_ID_RANGE, len(shards) - 1)]
+
+
+def _using(queryset, alias):
+    return queryset if alias is None else queryset.using(alias)
+
+
+def comments_for_news(news_id):
+    """Комментарии новости по её id, из нужного шарда."""
+    return _using(Comment.objects, shard_for_news(news_id)).filter(
+        news_id=news_id
+    )
+
+
+def comment_queryset(comment_id):
+    """Queryset комментариев шарда, в котором лежит комментарий с id."""
+    return _using(Comment.objects.all(), shard_for_comment(comment_id))
+
+
+@contextmanager
+def atomic_with_shards(*aliases):
+    """
+    Транзакция в основной БД и в шардах aliases (None — без шарда).
+
+    Шарды фиксируются раньше основной БД, и ошибка в шарде откатывает
+    обе. Двухфазной фиксации у SQLite нет: если после фиксации шарда
+    не зафиксируется основная БД, счётчики comment_count исправит
+    команда recount_comments.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(transaction.atomic())
+        for alias in sorted(set(aliases) - {None, DEFAULT_DB_ALIAS}):
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+def for_each_shard(queryset):
+    """Копии queryset для каждого шарда (или сам queryset без шардов)."""
+    shards = settings.COMMENT_SHARDS
+    if not shards:
+        return [queryset]
+    return [queryset.using(alias) for alias in shards]
+
+
+def group_by_shard(comments):
+    groups = defaultdict(list)
+    for comment in comments:
+        groups[shard_for_news(comment.news_id)].append(comment)
+    return groups
+
+
+def bulk_create_comments(comments, batch_size=None):
+    """bulk_create с раскладкой комментариев по шардам."""
+    created = []
+    for alias, group in group_by_shard(comments).items():
+        created += _using(Comment.objects, alias).bulk_create(
+            group, batch_size=batch_size
+        )
+    return created
+
+
+def count_comments(news_ids):
+    """
+    Число комментариев по id новостей.
+
+    По одному агрегирующему запросу на каждый шард, где лежат
+    комментарии этих новостей.
+    """
+    by_shard = defaultdict(list)
+    for news_id in news_ids:
+        by_shard[shard_for_news(news_id)].append(news_id)
+    counts = {}
+    for alias, ids in by_shard.items():
+        counts.update(
+            _using(Comment.objects, alias).filter(news_id__in=ids)
+            .order_by().values_list('news').annotate(Count('pk'))
+        )
+    return counts
+
+
+class CommentShardRouter:
+    """
+    Роутер комментариев по шардам.
+
+    Шард определяется по подсказке instance: комментарию или новости.
+    Связанные с комментарием из шарда новости и пользователи читаются
+    из основной БД. Без подсказки решение остаётся следующим роутерам.
+    """
+
+    def route(self, model, instance=None, **hints):
+        if not settings.COMMENT_SHARDS or instance is None:
+            return None
+        if model is Comment:
+            if isinstance(instance, Comment) and instance.news_id:
+                return shard_for_news(instance.news_id)
+            if isinstance(instance, News) and instance.pk:
+                return shard_for_news(instance.pk)
+            return None
+        if isinstance(instance, Comment) and (
+            instance._state.db not in (None, DEFAULT_DB_ALIAS)
+        ):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_read = route
+    db_for_write = route
+
+
+@receiver(post_migrate)
+def reserve_comment_ids(sender, using, **kwargs):
+    """Сдвигает счётчик id комментариев шарда в его диапазон."""
+    shards = settings.COMMENT_SHARDS
+    if sender.name != 'news' or using not in shards:
+        return
+    start = shards.index(using) * SHARD_ID_RANGE
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = %s "
+            "WHERE name = 'news_comment' AND seq < %s",
+            (start, start)
+        )
+        cursor.execute(
+            "INSERT INTO sqlite_sequence (name, seq) "
+            "SELECT 'news_comment', %s WHERE NOT EXISTS ("
+            "SELECT 1 FROM sqlite_sequence WHERE name = 'news_comment')",
+            (start,)
+        )
+
+
+@receiver(pre_delete, sender=News)
+def delete_news_comments(sender, instance, using, **kwargs):
+    # Каскадное удаление Django видит только комментарии в БД новости.
+    alias = shard_for_news(instance.pk)
+    if alias is not None and alias != using:
+        Comment.objects.using(alias).filter(news_id=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_author_comments(sender, instance, using, **kwargs):
+    for alias in settings.COMMENT_SHARDS:
+        if alias != using:
+            Comment.objects.using(alias).filter(
+                author_id=instance.pk
+            ).delete()
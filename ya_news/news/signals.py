@@ -0,0 +1,29 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_home_page, invalidate_news
+from .feed import schedule_rebuild
+from .models import Comment, News
+
+
+def _invalidate(invalidate):
+    # Сбрасываем кэш сразу и ещё раз после коммита, чтобы между
+    # сохранением и коммитом в кэш не попала устаревшая страница.
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver((post_save, post_delete), sender=News)
+def news_changed(sender, instance, **kwargs):
+    _invalidate(partial(invalidate_news, instance.pk, instance.comment_count))
+    transaction.on_commit(schedule_rebuild)
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # Карточка новости зависит от comment_count и обновится сама.
+    _invalidate(invalidate_home_page)
+    transaction.on_commit(partial(schedule_rebuild, (instance.news_id,)))
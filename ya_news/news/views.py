@@ -1,46 +1,230 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import close_old_connections
+from django.db.models import BooleanField, ExpressionWrapper, F, Q, Value
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.template.loader import get_template
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .cache import AnonymousPageCacheMixin, get_stats
+from .etags import news_detail_etag, news_list_etag
+from .feed import get_home_page
 from .forms import CommentForm
+from .ingest import get_comment_queue
 from .models import Comment, News
+from .pagination import KeysetPaginationMixin, KeysetPaginator, iter_chunks
+from .search import search
+from .sharding import (
+    atomic_with_shards, comment_queryset, shard_for_comment, shard_for_news
+)
+
+# Метка места комментариев в потоковом detail.html. Текст новости
+# экранируется шаблоном, поэтому встретиться в нём метка не может.
+COMMENTS_MARKER = mark_safe('<!-- comments -->')
+COMMENTS_TEMPLATE = 'includes/comments.html'
 
 
-class NewsList(generic.ListView):
-    """Список новостей."""
+@method_decorator(condition(etag_func=news_list_etag), name='get')
+class NewsList(
+        AnonymousPageCacheMixin, KeysetPaginationMixin, generic.ListView
+):
+    """
+    Список новостей.
+
+    На странице выводится несколько новостей, их количество определяется
+    в настройках проекта. Следующие страницы открываются по курсору.
+    Для анонимных пользователей страница отдаётся из кэша, а при
+    совпадении ETag — ответ 304 без тела. При HOME_FEED_SNAPSHOT первая
+    страница берётся из снимка ленты (news/feed.py).
+    """
     model = News
     template_name = 'news/home.html'
+    paginate_by = settings.NEWS_COUNT_ON_HOME_PAGE
 
-    def get_queryset(self):
-        """
-        Выводим только несколько последних новостей.
+    def paginate_queryset(self, queryset, page_size):
+        if (
+            settings.HOME_FEED_SNAPSHOT
+            and not self.request.GET.get(self.cursor_kwarg)
+        ):
+            page = get_home_page()
+            if page is not None:
+                return None, page, page.object_list, page.has_next()
+        return super().paginate_queryset(queryset, page_size)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_alias'] = settings.NEWS_CACHE_ALIAS
+        context['cache_timeout'] = settings.NEWS_CACHE_TIMEOUT
+        return context
+
+
+class AsyncViewMixin:
+    """
+    Представление с асинхронными обработчиками.
+
+    Django 3.2 не поддерживает async def в CBV сам (это появилось в 4.1):
+    as_view помечается как корутина, а ответ обработчика ожидается.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+
+class AsyncGetMixin(AsyncViewMixin):
+    """
+    Асинхронный GET поверх синхронного представления для ASGI.
+
+    ORM в Django 3.2 синхронный, поэтому GET выполняется в пуле потоков
+    (sync_to_async с thread_sensitive=False). Синхронное представление
+    Django под ASGI выполняет в одном общем потоке, а здесь запросы к БД
+    разных GET идут параллельно, каждый через соединение своего потока.
+    Соединения потоков пула закрываются по CONN_MAX_AGE в начале и в
+    конце GET, как Django делает это для своего потока. Шаблон
+    рендерится уже в общем потоке.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        get = sync_to_async(self.get_in_thread, thread_sensitive=False)
+        return await get(request, *args, **kwargs)
+
+    def get_in_thread(self, request, *args, **kwargs):
+        close_old_connections()
+        try:
+            return super().get(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+class AsyncNewsList(AsyncGetMixin, NewsList):
+    """Асинхронный вариант NewsList."""
+
+
+class NewsSearch(generic.TemplateView):
+    """Полнотекстовый поиск по новостям и комментариям."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        try:
+            page = int(self.request.GET.get('page', 1))
+        except ValueError:
+            raise Http404('Неверный номер страницы.')
+        if page < 1:
+            raise Http404('Неверный номер страницы.')
+        context['query'] = query
+        context['page_obj'] = search(
+            query, page, settings.SEARCH_RESULTS_ON_PAGE
+        )
+        return context
 
-        Их количество определяется в настройках проекта.
-        """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
 
+def cache_stats(request):
+    """Счётчики кэша главной страницы в формате JSON."""
+    return JsonResponse(get_stats())
 
+
+@method_decorator(condition(etag_func=news_detail_etag), name='get')
 class NewsDetail(generic.DetailView):
+    """
+    Новость с комментариями.
+
+    Комментарии выводятся страницами по курсору. При NEWS_DETAIL_STREAMING
+    страница отдаётся StreamingHttpResponse: сначала заголовок и текст
+    новости, затем все комментарии (после курсора, если он есть) частями
+    по COMMENTS_STREAM_CHUNK_SIZE, которые читаются из БД курсором.
+    """
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
+
+    def is_streaming(self):
+        return settings.NEWS_DETAIL_STREAMING
+
+    def get_comments_queryset(self):
+        """
+        Комментарии новости с полями, которые нужны шаблону.
+
+        Автор загружается только с именем (тем же запросом, если
+        комментарии не в шардах), а признак is_mine (комментарий
+        текущего пользователя) вычисляется в SQL.
+        """
+        user = self.request.user
+        if user.is_authenticated:
+            is_mine = ExpressionWrapper(
+                Q(author_id=user.pk), output_field=BooleanField()
+            )
+        else:
+            is_mine = Value(False, output_field=BooleanField())
+        return self.object.comment_set.with_authors(
+            'news', 'text', 'created'
+        ).annotate(is_mine=is_mine)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        paginator = KeysetPaginator(
+            self.get_comments_queryset(),
+            settings.COMMENTS_COUNT_ON_NEWS_PAGE
+        )
+        cursor = self.request.GET.get('cursor')
+        if self.is_streaming():
+            comments = paginator.after(cursor)
+            # БД выбирается сейчас: роутер реплик смотрит на запрос,
+            # а комментарии читаются уже после выхода из представления.
+            context['comments'] = comments.using(comments.db)
+            context['comments_marker'] = COMMENTS_MARKER
+        else:
+            context['comments'] = paginator.get_page(cursor)
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
         return context
 
+    def render_to_response(self, context, **response_kwargs):
+        if not self.is_streaming():
+            return super().render_to_response(context, **response_kwargs)
+        # Страница вокруг комментариев рендерится сразу: ошибки шаблона
+        # дают обычный ответ 500, а CSRF-токен формы попадает в cookie
+        # до отправки заголовков.
+        head, tail = super().render_to_response(
+            context, **response_kwargs
+        ).rendered_content.split(COMMENTS_MARKER, 1)
+        return StreamingHttpResponse(
+            self.stream(head, context['comments'], tail),
+            **response_kwargs
+        )
+
+    def stream(self, head, comments, tail):
+        yield head
+        template = get_template(COMMENTS_TEMPLATE)
+        empty = True
+        for chunk in iter_chunks(
+            comments, settings.COMMENTS_STREAM_CHUNK_SIZE
+        ):
+            empty = False
+            yield template.render({'comments': chunk})
+        if empty:
+            yield template.render({'comments': ()})
+        yield tail
+
 
 class NewsComment(
         LoginRequiredMixin,
@@ -59,7 +243,14 @@ class NewsComment(
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
+        if settings.COMMENT_WRITE_BEHIND:
+            get_comment_queue().submit(comment)
+            return super().form_valid(form)
+        with atomic_with_shards(shard_for_news(self.object.pk)):
+            comment.save()
+            News.objects.filter(pk=self.object.pk).update(
+                comment_count=F('comment_count') + 1
+            )
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -78,6 +269,30 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
+class AsyncNewsDetail(AsyncGetMixin, NewsDetail):
+    """
+    Асинхронный вариант NewsDetail.
+
+    Без потоковой отдачи: в Django 3.2 ASGI-обработчик читает потоковый
+    ответ прямо в цикле событий, где запросы к БД запрещены.
+    """
+
+    def is_streaming(self):
+        return False
+
+
+class AsyncNewsDetailView(AsyncViewMixin, generic.View):
+    """Асинхронный вариант NewsDetailView; комментарий пишется в потоке."""
+
+    async def get(self, request, *args, **kwargs):
+        view = AsyncNewsDetail.as_view()
+        return await view(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        view = sync_to_async(NewsComment.as_view(), thread_sensitive=True)
+        return await view(request, *args, **kwargs)
+
+
 class CommentBase(LoginRequiredMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
@@ -90,7 +305,9 @@ class CommentBase(LoginRequiredMixin):
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        return comment_queryset(self.kwargs['pk']).filter(
+            author=self.request.user
+        )
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -102,3 +319,11 @@ class CommentUpdate(CommentBase, generic.UpdateView):
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+    def delete(self, request, *args, **kwargs):
+        with atomic_with_shards(shard_for_comment(self.kwargs['pk'])):
+            response = super().delete(request, *args, **kwargs)
+            News.objects.filter(
+                pk=self.object.news_id, comment_count__gt=0
+            ).update(comment_count=F('comment_count') - 1)
+        return response
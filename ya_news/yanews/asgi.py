@@ -11,6 +11,8 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+from yanews import settings_module
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module())
 
 application = get_asgi_application()
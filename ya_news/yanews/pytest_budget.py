@@ -0,0 +1,118 @@
+"""
+Плагин pytest с бюджетами для тестов.
+
+Маркеры max_queries(n) и max_ms(ms) ограничивают число SQL-запросов и
+время выполнения теста (без фикстур и setUpTestData). Работают и с
+функциями pytest, и с классами django.test.TestCase. В конце прогона
+печатается таблица самых медленных представлений по данным
+RequestTimingMiddleware. При запуске через pytest-xdist данные
+воркеров собираются в главном процессе.
+"""
+import json
+from contextlib import ExitStack
+from time import perf_counter
+
+import pytest
+from django.db import connections
+
+from .timing import (
+    export_samples, get_histograms, import_samples, reset_histograms
+)
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--slowest-views', type=int, default=10,
+        help='Сколько самых медленных представлений показать (0 — ни одного).'
+    )
+    parser.addoption(
+        '--views-report', metavar='PATH',
+        help='Сохранить статистику представлений в JSON.'
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'max_queries(n): тест выполняет не больше n SQL-запросов.'
+    )
+    config.addinivalue_line(
+        'markers', 'max_ms(ms): тест выполняется не дольше ms миллисекунд.'
+    )
+
+
+def pytest_sessionstart(session):
+    reset_histograms()
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    max_queries = item.get_closest_marker('max_queries')
+    max_ms = item.get_closest_marker('max_ms')
+    if max_queries is None and max_ms is None:
+        return (yield)
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        start = perf_counter()
+        # Упавший тест пробрасывает исключение здесь же, бюджет не важен.
+        result = yield
+        elapsed = (perf_counter() - start) * 1000
+    if max_queries is not None and counter.count > max_queries.args[0]:
+        pytest.fail(
+            f'Выполнено {counter.count} SQL-запросов, '
+            f'бюджет — {max_queries.args[0]}.',
+            pytrace=False
+        )
+    if max_ms is not None and elapsed > max_ms.args[0]:
+        pytest.fail(
+            f'Тест выполнялся {elapsed:.0f} мс, бюджет — {max_ms.args[0]} мс.',
+            pytrace=False
+        )
+    return result
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    import_samples(getattr(node, 'workeroutput', {}).get('view_samples', {}))
+
+
+def pytest_sessionfinish(session):
+    workeroutput = getattr(session.config, 'workeroutput', None)
+    if workeroutput is not None:
+        workeroutput['view_samples'] = export_samples()
+        return
+    path = session.config.getoption('views_report')
+    if path:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(get_histograms(), file, ensure_ascii=False, indent=2)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    limit = config.getoption('slowest_views')
+    histograms = get_histograms()
+    if not limit or not histograms:
+        return
+    rows = sorted(
+        histograms.items(), key=lambda row: row[1]['p95'], reverse=True
+    )[:limit]
+    terminalreporter.write_sep('=', 'самые медленные представления')
+    terminalreporter.write_line(
+        f'{"представление":<24}{"вызовов":>10}{"p50, мс":>10}'
+        f'{"p95, мс":>10}{"max, мс":>10}'
+    )
+    for name, stats in rows:
+        terminalreporter.write_line(
+            f'{name:<24}{stats["count"]:>10}{stats["p50"]:>10.1f}'
+            f'{stats["p95"]:>10.1f}{stats["max"]:>10.1f}'
+        )
@@ -0,0 +1,114 @@
+"""
+Чтение новостей и комментариев с реплик.
+
+Чтение с реплики включает ReplicaMiddleware и только для безопасных
+запросов (GET, HEAD); код вне HTTP-запроса — команды, фоновые потоки —
+работает с основной БД. Пользователь, выполнивший запись, читает
+с основной БД ещё PRIMARY_PIN_SECONDS секунд, чтобы видеть свои
+изменения, пока они не дошли до реплики.
+"""
+import asyncio
+import random
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY_PIN_COOKIE = 'news_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """
+    Роутер: чтение моделей из REPLICA_APPS — с реплик NEWS_READ_REPLICAS.
+
+    Пользователи и сессии всегда читаются с основной БД, запись тоже
+    идёт в неё.
+    """
+    REPLICA_APPS = {'news'}
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.NEWS_READ_REPLICAS
+        if (
+            replicas and _replica_reads.get()
+            and model._meta.app_label in self.REPLICA_APPS
+        ):
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Объект, прочитанный с реплики, сохраняется в основную БД.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД.
+        return True
+
+
+@contextmanager
+def primary_reads():
+    """Внутри блока модели из REPLICA_APPS читаются с основной БД."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик и закрепляет писавших за основной БД."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 отличает асинхронный middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _replica_reads.set(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _replica_reads.set(self.use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.pin(request, response)
+
+    def use_replica(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and PRIMARY_PIN_COOKIE not in request.COOKIES
+        )
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, '1',
+                max_age=settings.PRIMARY_PIN_SECONDS, samesite='Lax',
+            )
+        return response
+
+
+def replicate(source, target):
+    """
+    Копирует файл SQLite source в target через backup API.
+
+    Заменяет репликацию при локальном запуске: копия согласована,
+    даже если в source в это время пишут.
+    """
+    with closing(sqlite3.connect(source)) as primary:
+        with closing(sqlite3.connect(target)) as replica:
+            primary.backup(replica)
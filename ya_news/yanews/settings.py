@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,11 +22,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanews.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yanews.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -34,7 +37,8 @@ ROOT_URLCONF = 'yanews.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yanews.timing.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -51,10 +55,58 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
+# SQLite с транзакциями BEGIN IMMEDIATE, см. yanews/sqlite_backend.
+# Тестовая БД задана явно: pytest-django оставляет в памяти БД воркеров
+# pytest-xdist только для стандартного движка sqlite3.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yanews.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': ':memory:'},
+    }
+}
+
+# Реплики только для чтения новостей и комментариев (yanews/replicas.py).
+# Локально реплику изображает копия db.sqlite3, которую обновляет
+# команда replicate_db. Записавший пользователь читает с основной БД
+# ещё PRIMARY_PIN_SECONDS секунд.
+NEWS_READ_REPLICAS = []
+if os.environ.get('NEWS_REPLICA') == '1':
+    DATABASES['replica'] = {
+        'ENGINE': 'yanews.sqlite_backend',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    NEWS_READ_REPLICAS = ['replica']
+PRIMARY_PIN_SECONDS = 5
+
+# Шарды комментариев (news/sharding.py): комментарии новости хранятся
+# в COMMENT_SHARDS[news_id % N]. Локально NEWS_COMMENT_SHARDS=N создаёт
+# N файлов db_comments_<k>.sqlite3; их нужно мигрировать командой
+# migrate --database comments_<k>. Новостей и пользователей в шардах нет,
+# поэтому внешние ключи там не проверяются (FOREIGN_KEYS).
+COMMENT_SHARDS = []
+for index in range(int(os.environ.get('NEWS_COMMENT_SHARDS', 0))):
+    DATABASES[f'comments_{index}'] = {
+        'ENGINE': 'yanews.sqlite_backend',
+        'NAME': BASE_DIR / f'db_comments_{index}.sqlite3',
+        'FOREIGN_KEYS': False,
+        'TEST': {'NAME': ':memory:'},
+    }
+    COMMENT_SHARDS.append(f'comments_{index}')
+
+DATABASE_ROUTERS = [
+    'news.sharding.CommentShardRouter',
+    'yanews.replicas.ReplicaRouter',
+]
+
+# PRAGMA, которые выполняются для каждого нового соединения с SQLite,
+# см. yanews.sqlite.set_sqlite_pragmas. В разработке не нужны.
+SQLITE_PRAGMAS = {}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -80,3 +132,57 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+# Первая страница ленты из снимка HomeFeedSnapshot (news/feed.py).
+# Снимок пересобирается через HOME_FEED_DEBOUNCE с после изменения
+# (None — сразу, в том же потоке). HOME_FEED_FALLBACK = True: пока снимок
+# не пересобран, лента строится живым запросом.
+HOME_FEED_SNAPSHOT = os.environ.get('HOME_FEED_SNAPSHOT') == '1'
+HOME_FEED_DEBOUNCE = 1
+HOME_FEED_FALLBACK = False
+
+# Асинхронные NewsList и NewsDetail для запуска под ASGI (news/urls.py).
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+
+COMMENTS_COUNT_ON_NEWS_PAGE = 50
+# Потоковая отдача страницы новости со всеми комментариями частями
+# по COMMENTS_STREAM_CHUNK_SIZE (NewsDetail, только под WSGI).
+NEWS_DETAIL_STREAMING = os.environ.get('NEWS_DETAIL_STREAMING') == '1'
+COMMENTS_STREAM_CHUNK_SIZE = 200
+SEARCH_RESULTS_ON_PAGE = 20
+
+# Отложенная запись комментариев (news/ingest.py): очередь на
+# COMMENT_QUEUE_SIZE комментариев, фоновый поток пишет их пачками до
+# COMMENT_QUEUE_BATCH_SIZE, собирая пачку не дольше FLUSH_INTERVAL с.
+# Если очередь полна дольше PUT_TIMEOUT с, запрос пишет комментарий сам.
+# Принятые комментарии сначала попадают в журнал в каталоге
+# COMMENT_QUEUE_JOURNAL (None — без журнала), отвергнутые БД — в файл
+# COMMENT_QUEUE_DEAD_LETTER.
+COMMENT_WRITE_BEHIND = os.environ.get('COMMENT_WRITE_BEHIND') == '1'
+COMMENT_QUEUE_SIZE = 1000
+COMMENT_QUEUE_BATCH_SIZE = 100
+COMMENT_QUEUE_FLUSH_INTERVAL = 0.05
+COMMENT_QUEUE_PUT_TIMEOUT = 1
+COMMENT_QUEUE_JOURNAL = BASE_DIR / 'comment_journal'
+COMMENT_QUEUE_DEAD_LETTER = BASE_DIR / 'comment_dead_letter.jsonl'
+
+NEWS_CACHE_ALIAS = 'default'
+NEWS_CACHE_TIMEOUT = 60 * 15
+
+# Класс фильтра запрещённых слов и необязательный файл с дополнительными
+# словами (по одному в строке). Файл перечитывается при изменении.
+BAD_WORDS_FILTER = 'news.moderation.FileBadWordsFilter'
+BAD_WORDS_FILE = None
+
+# Бюджеты на запрос по имени URL: число SQL-запросов и время в мс.
+# При превышении RequestTimingMiddleware пишет предупреждение в лог
+# ('log') или выбрасывает BudgetExceeded ('raise').
+REQUEST_BUDGETS = {
+    'news:home': {'queries': 4, 'ms': 200},
+    'news:detail': {'queries': 10, 'ms': 300},
+    'news:edit': {'queries': 8, 'ms': 200},
+    'news:delete': {'queries': 8, 'ms': 200},
+    'news:search': {'queries': 4, 'ms': 300},
+}
+REQUEST_BUDGET_ACTION = 'log'
+REQUEST_HISTOGRAM_SIZE = 1000
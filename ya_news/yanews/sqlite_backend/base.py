@@ -0,0 +1,38 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite, в котором транзакции atomic() начинаются с BEGIN IMMEDIATE.
+
+    Отложенная транзакция (BEGIN) сначала берёт блокировку чтения, например
+    когда триггер FTS5 читает настройки индекса, а при переходе к записи
+    SQLite не ждёт busy_timeout и сразу возвращает SQLITE_BUSY. BEGIN
+    IMMEDIATE берёт блокировку записи в начале транзакции, и занятая БД
+    ожидается штатно.
+
+    В БД с 'FOREIGN_KEYS': False внешние ключи не проверяются ни при
+    записи, ни после миграций: так настроены шарды комментариев, где
+    новостей и пользователей, на которых ссылаются комментарии, нет.
+    """
+
+    @property
+    def foreign_keys(self):
+        return self.settings_dict.get('FOREIGN_KEYS', True)
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if not self.foreign_keys:
+            conn.execute('PRAGMA foreign_keys = OFF')
+        return conn
+
+    def enable_constraint_checking(self):
+        if self.foreign_keys:
+            super().enable_constraint_checking()
+
+    def check_constraints(self, table_names=None):
+        if self.foreign_keys:
+            super().check_constraints(table_names)
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceeded(Exception):
+    """Запрос превысил бюджет из настройки REQUEST_BUDGETS."""
+
+
+class RequestTiming:
+    """Счётчик SQL-запросов и времени одного HTTP-запроса."""
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += perf_counter() - start
+
+
+class RollingHistogram:
+    """Последние значения длительности запросов к одному URL."""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, value):
+        with self.lock:
+            self.samples.append(value)
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {'count': 0}
+
+        def percentile(share):
+            return samples[min(len(samples) - 1, int(len(samples) * share))]
+
+        return {
+            'count': len(samples),
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': samples[-1],
+        }
+
+
+class HistogramRegistry:
+    """Гистограммы длительности по имени: URL или шаблона."""
+
+    def __init__(self):
+        self.histograms = defaultdict(
+            lambda: RollingHistogram(settings.REQUEST_HISTOGRAM_SIZE)
+        )
+        self.lock = threading.Lock()
+
+    def add(self, name, value):
+        with self.lock:
+            histogram = self.histograms[name]
+        histogram.add(value)
+
+    def items(self):
+        with self.lock:
+            return list(self.histograms.items())
+
+    def snapshot(self):
+        return {name: hist.snapshot() for name, hist in self.items()}
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+_views = HistogramRegistry()
+_templates = HistogramRegistry()
+
+
+def get_histograms():
+    """Перцентили длительности запросов в мс по имени URL."""
+    return _views.snapshot()
+
+
+def get_template_histograms():
+    """Перцентили времени рендеринга в мс по имени шаблона."""
+    return _templates.snapshot()
+
+
+def export_samples():
+    """Сырые длительности по имени URL, чтобы объединить их с другими."""
+    return {name: list(hist.samples) for name, hist in _views.items()}
+
+
+def import_samples(samples):
+    for name, values in samples.items():
+        for value in values:
+            _record(name, value)
+
+
+def reset_histograms():
+    _views.clear()
+    _templates.clear()
+
+
+def _record(name, total_ms):
+    _views.add(name, total_ms)
+
+
+class TimedTemplate(Template):
+    """Шаблон, записывающий время своего рендеринга в гистограмму."""
+
+    def render(self, context=None, request=None):
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            if self.template.name:
+                _templates.add(
+                    self.template.name, (perf_counter() - start) * 1000
+                )
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Шаблонизатор Django с замером времени рендеринга шаблонов.
+
+    Время включает вложенные шаблоны ({% extends %}, {% include %})
+    и ленивые запросы к БД из шаблона.
+    """
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def template_stats(request):
+    """Время рендеринга шаблонов в формате JSON, только при DEBUG."""
+    if not settings.DEBUG:
+        raise Http404
+    return JsonResponse(get_template_histograms())
+
+
+_current_timing = ContextVar('request_timing', default=None)
+
+
+def timed_execute(execute, sql, params, many, context):
+    """Обёртка execute: учитывает запрос в RequestTiming текущего запроса."""
+    timing = _current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def install_timing_wrapper(sender, connection, **kwargs):
+    """
+    Подключает timed_execute к новому соединению с БД.
+
+    Текущий запрос берётся из contextvars, поэтому SQL асинхронных
+    представлений, выполняемый в потоке sync_to_async, тоже учитывается.
+    """
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+class RequestTimingMiddleware:
+    """
+    Считает SQL-запросы и время обработки запроса.
+
+    Количество запросов, время в БД, в шаблонах и в остальном Python
+    добавляются в заголовки ответа и в гистограмму по имени URL.
+    Превышение бюджета из REQUEST_BUDGETS пишется в лог или, если
+    REQUEST_BUDGET_ACTION = 'raise', приводит к BudgetExceeded.
+    Работает и под WSGI, и под ASGI; SQL учитывается обёрткой
+    timed_execute, см. install_timing_wrapper.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 отличает асинхронный middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        request.timing = RequestTiming()
+        return _current_timing.set(request.timing)
+
+    def finish(self, request, response):
+        timing = request.timing
+        total = (perf_counter() - timing.start) * 1000
+        db_time = timing.db_time * 1000
+        template_time = timing.template_time * 1000
+        python_time = total - db_time - template_time
+        response['X-DB-Queries'] = str(timing.queries)
+        response['X-DB-Time'] = f'{db_time:.2f}'
+        response['X-Template-Time'] = f'{template_time:.2f}'
+        response['X-Python-Time'] = f'{python_time:.2f}'
+        response['Server-Timing'] = (
+            f'db;dur={db_time:.2f}, tpl;dur={template_time:.2f}, '
+            f'py;dur={python_time:.2f}'
+        )
+        match = request.resolver_match
+        name = match.view_name if match else None
+        if name:
+            _record(name, total)
+            self.check_budget(name, timing.queries, total)
+        return response
+
+    def process_template_response(self, request, response):
+        timing = request.timing
+        start = perf_counter()
+        db_time = timing.db_time
+
+        def rendered(response):
+            # Запросы из ленивых queryset в шаблоне считаются временем БД.
+            timing.template_time += (
+                perf_counter() - start - (timing.db_time - db_time)
+            )
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def check_budget(self, name, queries, total):
+        budget = settings.REQUEST_BUDGETS.get(name)
+        if not budget:
+            return
+        problems = []
+        if queries > budget.get('queries', queries):
+            problems.append(f'{queries} SQL-запросов из {budget["queries"]}')
+        if total > budget.get('ms', total):
+            problems.append(f'{total:.0f} мс из {budget["ms"]}')
+        if not problems:
+            return
+        message = f'{name}: превышен бюджет — {", ".join(problems)}'
+        if settings.REQUEST_BUDGET_ACTION == 'raise':
+            raise BudgetExceeded(message)
+        logger.warning(message)
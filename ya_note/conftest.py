@@ -0,0 +1 @@
+pytest_plugins = ('yanote.pytest_budget',)
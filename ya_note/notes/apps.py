@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from yanote.sqlite import set_sqlite_pragmas
+        from yanote.timing import install_timing_wrapper
+        connection_created.connect(set_sqlite_pragmas)
+        connection_created.connect(install_timing_wrapper)
@@ -0,0 +1,45 @@
+"""
+Валидаторы для условных GET-запросов (If-None-Match, If-Modified-Since).
+
+Считаются одним запросом к БД, без рендеринга шаблона.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+from .models import Note
+
+
+def make_etag(request, *state):
+    parts = (request.user.pk, request.get_full_path(), *state)
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def note_last_modified(request, slug):
+    """Время изменения заметки; запрос выполняется один раз на запрос."""
+    if not hasattr(request, 'note_updated'):
+        request.note_updated = Note.objects.filter(
+            slug=slug, author=request.user
+        ).values_list('updated', flat=True).first()
+    return request.note_updated
+
+
+def note_etag(request, slug):
+    # Last-Modified точен до секунды, ETag различает и более частые правки.
+    updated = note_last_modified(request, slug)
+    if updated is None:
+        return None
+    return make_etag(request, updated)
+
+
+def notes_list_etag(request, *args, **kwargs):
+    """
+    ETag списка заметок пользователя.
+
+    Last-Modified не отдаётся: удаление заметки не меняет
+    максимальное время изменения, а число заметок меняет.
+    """
+    state = Note.objects.filter(author=request.user).aggregate(
+        count=Count('id'), updated=Max('updated')
+    )
+    return make_etag(request, *state.values())
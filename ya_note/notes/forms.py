@@ -1,27 +1,62 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Note
+from .models import Note, Tag
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    tag_names = forms.CharField(
+        label='Теги',
+        required=False,
+        help_text='Перечислите теги через запятую',
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['tag_names'] = ', '.join(
+                tag.name for tag in self.instance.tags.all()
+            )
+
+    def clean_tag_names(self):
+        """Список уникальных тегов в нижнем регистре."""
+        names = self.cleaned_data.get('tag_names', '').lower().split(',')
+        max_length = Tag._meta.get_field('name').max_length
+        tags = []
+        for name in names:
+            name = name.strip()
+            if len(name) > max_length:
+                raise ValidationError(
+                    f'Тег длиннее {max_length} символов: {name}'
+                )
+            if name and name not in tags:
+                tags.append(name)
+        return tags
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        names = self.cleaned_data['tag_names']
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in names), ignore_conflicts=True
+        )
+        self.instance.tags.set(Tag.objects.filter(name__in=names))
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
+        """
+        Обрабатывает случай, если указанный slug не уникален.
+
+        Пустой slug подберёт модель при сохранении.
+        """
+        slug = self.cleaned_data.get('slug')
         if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
+            return slug
         if Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
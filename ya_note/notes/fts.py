@@ -0,0 +1,45 @@
+"""
+Триггеры полнотекстового индекса notes_note_fts.
+
+В SQLite миграции, пересоздающие таблицу notes_note (AddField,
+AlterField, RemoveField), удаляют вместе с ней и триггеры индекса.
+Такие миграции окружают операцию двумя RunPython:
+
+    migrations.RunPython(migrations.RunPython.noop, recreate_triggers),
+    ...,
+    migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+
+Модуль импортируется миграциями, поэтому не зависит от моделей.
+"""
+
+TRIGGERS_SQL = (
+    """
+    CREATE TRIGGER notes_note_fts_insert AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, owner, title, text)
+        VALUES (new.id, 'u' || new.author_id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_delete AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, owner, title, text)
+        VALUES ('delete', old.id, 'u' || old.author_id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_update
+    AFTER UPDATE OF author_id, title, text ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, owner, title, text)
+        VALUES ('delete', old.id, 'u' || old.author_id, old.title, old.text);
+        INSERT INTO notes_note_fts(rowid, owner, title, text)
+        VALUES (new.id, 'u' || new.author_id, new.title, new.text);
+    END
+    """,
+)
+
+
+def recreate_triggers(apps, schema_editor):
+    """Полнотекстовый индекс FTS5 есть только в SQLite."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
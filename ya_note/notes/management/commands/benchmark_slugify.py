@@ -0,0 +1,53 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from pytils.translit import slugify
+
+from notes.slugs import cached_slugify, slugify_cache_stats
+
+WORDS = (
+    'заметка', 'список', 'покупок', 'планы', 'на', 'неделю', 'встреча',
+    'с', 'командой', 'идеи', 'для', 'проекта', 'рецепт', 'пирога',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость вызова pytils slugify и кэширующей '
+        'обёртки на повторяющихся кириллических заголовках.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=200_000)
+        parser.add_argument(
+            '--unique', type=int, nargs='+', default=(100, 1_000, 50_000),
+            help='Число различных заголовков в потоке.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def measure(self, function, titles):
+        start = perf_counter()
+        for title in titles:
+            function(title)
+        return (perf_counter() - start) / len(titles) * 1e6
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        for unique in options['unique']:
+            pool = [
+                ' '.join(rnd.choices(WORDS, k=rnd.randint(2, 6)))
+                + f' {index}'
+                for index in range(unique)
+            ]
+            titles = rnd.choices(pool, k=options['calls'])
+            cached_slugify.cache_clear()
+            raw = self.measure(slugify, titles)
+            cached = self.measure(cached_slugify, titles)
+            stats = slugify_cache_stats()
+            self.stdout.write(
+                f'Заголовков: {unique:>6}  '
+                f'slugify: {raw:.2f} мкс/вызов  '
+                f'с кэшем: {cached:.2f} мкс/вызов  '
+                f'попаданий: {stats["hit_rate"]:.1%}'
+            )
@@ -0,0 +1,43 @@
+import json
+from functools import partial
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from notes.management.stats import throughput_report
+from notes.models import Note
+
+FIELDS = ('title', 'text', 'slug', 'author__username')
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заметки в JSON Lines, не загружая таблицу в память.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-', help='Файл JSONL или - для stdout.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def export_rows(self, write, chunk_size):
+        rows = Note.objects.order_by('pk').values_list(*FIELDS).iterator(
+            chunk_size=chunk_size
+        )
+        total = 0
+        for title, text, slug, author in rows:
+            write(json.dumps(
+                {'title': title, 'text': text, 'slug': slug, 'author': author},
+                ensure_ascii=False
+            ) + '\n')
+            total += 1
+        return total
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        if options['path'] == '-':
+            write = partial(self.stdout.write, ending='')
+            total = self.export_rows(write, options['chunk_size'])
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file:
+                total = self.export_rows(file.write, options['chunk_size'])
+        self.stderr.write(throughput_report(total, perf_counter() - start))
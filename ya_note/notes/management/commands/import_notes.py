@@ -0,0 +1,81 @@
+import json
+import sys
+from itertools import islice
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.management.stats import throughput_report
+from notes.models import Note, User
+
+
+def read_rows(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise CommandError(f'Строка {number}: {error}') from error
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заметки из JSON Lines: по объекту с полями title, text, '
+        'slug и author (username) в строке. Пустой slug генерируется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSONL или - для stdin.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def get_authors(self, usernames, authors):
+        missing = set(usernames) - authors.keys()
+        if missing:
+            authors.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+        unknown = missing - authors.keys()
+        if unknown:
+            raise CommandError(
+                f'Неизвестные авторы: {", ".join(sorted(unknown))}'
+            )
+        return authors
+
+    def import_rows(self, rows, batch_size):
+        authors = {}
+        total = 0
+        for batch in batches(rows, batch_size):
+            self.get_authors((row['author'] for row in batch), authors)
+            notes = [
+                Note(
+                    title=row['title'],
+                    text=row['text'],
+                    slug=row.get('slug') or '',
+                    author_id=authors[row['author']],
+                )
+                for row in batch
+            ]
+            Note.objects.bulk_create_with_slugs(notes, batch_size=batch_size)
+            total += len(notes)
+        return total
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        batch_size = options['batch_size']
+        if options['path'] == '-':
+            total = self.import_rows(read_rows(sys.stdin), batch_size)
+        else:
+            with open(options['path'], encoding='utf-8') as file:
+                total = self.import_rows(read_rows(file), batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            throughput_report(total, perf_counter() - start)
+        ))
@@ -0,0 +1,150 @@
+import json
+import platform
+import subprocess
+from statistics import quantiles
+from time import perf_counter
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLResolver, get_resolver, reverse
+
+from notes.models import Note
+
+SKIP_NAMESPACES = ('admin',)
+
+
+def url_names(resolver=None, namespace=''):
+    """Имена всех URL проекта с пространствами имён, кроме админки."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIP_NAMESPACES:
+                continue
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            yield from url_names(pattern, prefix)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт временную тестовую БД, заполняет её seed_benchmark и '
+        'прогоняет каждый URL через тестовый клиент. Печатает JSON с '
+        'пропускной способностью и задержками p50/p95/p99.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--notes', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+
+    def get_targets(self):
+        """Пары (имя URL, клиент, адрес) для замера."""
+        anonymous = Client()
+        note = Note.objects.order_by('pk').first()
+        author = Client()
+        author.force_login(note.author)
+        tag = note.tags.first()
+        word = note.title.split()[0]
+        list_url = reverse('notes:list')
+        return (
+            ('notes:home', 'anonymous', anonymous, reverse('notes:home')),
+            ('notes:list', 'author', author, list_url),
+            ('notes:list', 'search', author, f'{list_url}?q={word}'),
+            ('notes:list', 'tag', author, f'{list_url}?tag={tag.name}'),
+            (
+                'notes:detail', 'author', author,
+                reverse('notes:detail', args=(note.slug,))
+            ),
+            (
+                'notes:edit', 'author', author,
+                reverse('notes:edit', args=(note.slug,))
+            ),
+            (
+                'notes:delete', 'author', author,
+                reverse('notes:delete', args=(note.slug,))
+            ),
+            ('notes:add', 'author', author, reverse('notes:add')),
+            ('notes:success', 'author', author, reverse('notes:success')),
+            ('users:login', 'anonymous', anonymous, reverse('users:login')),
+            ('users:signup', 'anonymous', anonymous, reverse('users:signup')),
+            ('users:logout', 'anonymous', anonymous, reverse('users:logout')),
+        )
+
+    def measure(self, client, url, warmup, requests):
+        for _ in range(warmup):
+            client.get(url)
+        timings = []
+        queries = None
+        start = perf_counter()
+        for _ in range(requests):
+            request_start = perf_counter()
+            response = client.get(url)
+            timings.append((perf_counter() - request_start) * 1000)
+            queries = response.get('X-DB-Queries', queries)
+        total = perf_counter() - start
+        percentiles = quantiles(timings, n=100)
+        return {
+            'status': response.status_code,
+            'requests': requests,
+            'rps': round(requests / total, 1),
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'queries': int(queries) if queries is not None else None,
+        }
+
+    def handle(self, *args, **options):
+        seed_options = {
+            key: options[key] for key in ('users', 'notes', 'tags', 'seed')
+        }
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command('seed_benchmark', stdout=self.stderr, **seed_options)
+            results = []
+            for name, client_name, client, url in self.get_targets():
+                result = self.measure(
+                    client, url, options['warmup'], options['requests']
+                )
+                results.append({'name': name, 'client': client_name, **result})
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        covered = {result['name'] for result in results}
+        report = {
+            'project': 'ya_note',
+            'commit': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'params': {**seed_options, 'requests': options['requests']},
+            'results': results,
+            'not_covered': sorted(set(url_names()) - covered),
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,78 @@
+import random
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from notes.models import Note, Tag, User
+
+WORDS = (
+    'список', 'покупок', 'планы', 'встреча', 'идеи', 'проект', 'рецепт',
+    'книги', 'фильмы', 'отпуск', 'ремонт', 'учёба', 'работа', 'спорт',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими пользователями, заметками и тегами '
+        'для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--notes', type=int, default=100,
+            help='Число заметок у каждого пользователя.'
+        )
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        start = perf_counter()
+        password = make_password(None)
+        User.objects.bulk_create(
+            (
+                User(username=f'bench{index}', password=password)
+                for index in range(options['users'])
+            ),
+            batch_size=batch_size
+        )
+        Tag.objects.bulk_create(
+            Tag(name=f'тег{index}') for index in range(options['tags'])
+        )
+        user_ids = User.objects.filter(
+            username__startswith='bench'
+        ).values_list('pk', flat=True)
+        Note.objects.bulk_create(
+            (
+                Note(
+                    title=' '.join(rnd.choices(WORDS, k=3)),
+                    text=' '.join(rnd.choices(WORDS, k=40)),
+                    slug=f'bench-{user_id}-{index}',
+                    author_id=user_id,
+                )
+                for user_id in user_ids
+                for index in range(options['notes'])
+            ),
+            batch_size=batch_size
+        )
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        note_ids = Note.objects.filter(
+            slug__startswith='bench-'
+        ).values_list('pk', flat=True)
+        Note.tags.through.objects.bulk_create(
+            (
+                Note.tags.through(note_id=note_id, tag_id=tag_id)
+                for note_id in note_ids
+                for tag_id in rnd.sample(tag_ids, min(2, len(tag_ids)))
+            ),
+            batch_size=batch_size
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {options["users"]}, заметок: '
+            f'{options["users"] * options["notes"]}, тегов: '
+            f'{options["tags"]}, {perf_counter() - start:.1f} с'
+        ))
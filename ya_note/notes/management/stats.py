@@ -0,0 +1,20 @@
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Пиковый объём памяти процесса в МБ или None, если не известен."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def throughput_report(rows, seconds):
+    rate = rows / seconds if seconds else 0.0
+    report = f'Строк: {rows}, {seconds:.2f} с, {rate:.0f} строк/с'
+    rss = peak_rss_mb()
+    if rss is not None:
+        report += f', пик памяти: {rss:.1f} МБ'
+    return report
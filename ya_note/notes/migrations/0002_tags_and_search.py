@@ -0,0 +1,70 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+from notes.fts import TRIGGERS_SQL
+
+FORWARD_SQL = (
+    """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        owner, title, text, content='',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    *TRIGGERS_SQL,
+    """
+    INSERT INTO notes_note_fts(rowid, owner, title, text)
+    SELECT id, 'u' || author_id, title, text FROM notes_note
+    """,
+)
+
+BACKWARD_SQL = (
+    'DROP TRIGGER notes_note_fts_insert',
+    'DROP TRIGGER notes_note_fts_delete',
+    'DROP TRIGGER notes_note_fts_update',
+    'DROP TABLE notes_note_fts',
+)
+
+
+def run_sqlite(statements):
+    """Полнотекстовый индекс FTS5 есть только в SQLite."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+                'verbose_name_plural': 'Теги',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'id'], name='note_author_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='notes', to='notes.Tag', verbose_name='Теги'),
+        ),
+        migrations.RunPython(
+            run_sqlite(FORWARD_SQL), run_sqlite(BACKWARD_SQL)
+        ),
+    ]
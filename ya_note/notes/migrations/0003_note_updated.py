@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+from notes.fts import recreate_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_tags_and_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,117 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 
-from pytils.translit import slugify
+from .search import FTS_TABLE, JOIN_WHERE, RANK_SQL, build_match
+from .slugs import cached_slugify
 
 User = get_user_model()
 
+SLUG_ATTEMPTS = 5
+SLUG_SUFFIX_RESERVE = 10
+DEFAULT_SLUG = 'note'
+
+
+def pick_slug(base, taken, max_length):
+    """
+    Первый свободный slug вида base, base-2, base-3...
+
+    Основа укорачивается так, чтобы суффикс помещался в max_length.
+    """
+    base = base[:max_length] or DEFAULT_SLUG
+    if base not in taken:
+        return base
+    number = 2
+    while True:
+        suffix = f'-{number}'
+        slug = base[:max_length - len(suffix)] + suffix
+        if slug not in taken:
+            return slug
+        number += 1
+
+
+class Tag(models.Model):
+    name = models.CharField('Название', max_length=50, unique=True)
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+
+class NoteQuerySet(models.QuerySet):
+
+    def search(self, author_id, query):
+        """
+        Заметки автора, подходящие под запрос, по убыванию релевантности.
+
+        Пустой запрос возвращает пустой queryset.
+        """
+        match = build_match(author_id, query)
+        if match is None:
+            return self.none()
+        return self.filter(author_id=author_id).extra(
+            tables=[FTS_TABLE],
+            where=JOIN_WHERE,
+            params=[match],
+            select={'rank': RANK_SQL},
+        ).order_by('rank', 'pk')
+
+    def taken_slugs(self, bases, exclude_pk=None):
+        """Занятые slug с любой из основ — одним запросом."""
+        max_length = self.model._meta.get_field('slug').max_length
+        condition = Q()
+        for base in set(bases):
+            # Длинная основа укорачивается под суффикс, ищем по её началу.
+            prefix = (base or DEFAULT_SLUG)[:max_length - SLUG_SUFFIX_RESERVE]
+            condition |= Q(slug__startswith=prefix)
+        queryset = self.filter(condition)
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        return set(queryset.values_list('slug', flat=True))
+
+    def allocate_slugs(self, notes):
+        """Назначает свободные slug заметкам без slug, не сохраняя их."""
+        max_length = self.model._meta.get_field('slug').max_length
+        pending = [note for note in notes if not note.slug]
+        bases = [
+            cached_slugify(note.title)[:max_length] for note in pending
+        ]
+        taken = self.taken_slugs(bases)
+        taken.update(note.slug for note in notes if note.slug)
+        for note, base in zip(pending, bases):
+            note.slug = pick_slug(base, taken, max_length)
+            taken.add(note.slug)
+        return pending
+
+    def bulk_create_with_slugs(self, notes, batch_size=1000):
+        """
+        bulk_create с генерацией slug пачками.
+
+        На каждую пачку — один запрос за занятыми slug. Если пачку
+        перехватил параллельный импорт, slug выбираются заново.
+        """
+        notes = list(notes)
+        created = []
+        for start in range(0, len(notes), batch_size):
+            batch = notes[start:start + batch_size]
+            for attempt in range(SLUG_ATTEMPTS):
+                pending = self.allocate_slugs(batch)
+                try:
+                    with transaction.atomic(using=self.db):
+                        created += self.bulk_create(batch)
+                    break
+                except IntegrityError:
+                    if not pending or attempt == SLUG_ATTEMPTS - 1:
+                        raise
+                    for note in pending:
+                        note.slug = ''
+        return created
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -30,12 +136,45 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    tags = models.ManyToManyField(
+        Tag,
+        verbose_name='Теги',
+        related_name='notes',
+        blank=True,
+    )
+    updated = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='note_author_id_idx'
+            ),
+            models.Index(
+                fields=('author', 'slug'), name='note_author_slug_idx'
+            ),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Без slug подбирает свободный по заголовку.
+
+        При гонке с параллельным сохранением slug подбирается заново.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        max_slug_length = self._meta.get_field('slug').max_length
+        base = cached_slugify(self.title)[:max_slug_length]
+        for attempt in range(SLUG_ATTEMPTS):
+            taken = Note.objects.taken_slugs((base,), exclude_pk=self.pk)
+            self.slug = pick_slug(base, taken, max_slug_length)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
@@ -0,0 +1,34 @@
+import re
+
+TOKEN = re.compile(r'\w+')
+
+# Индекс notes_note_fts создаётся миграцией 0002 и обновляется
+# триггерами. SQLite удаляет триггеры вместе с таблицей, поэтому
+# миграции, пересоздающие notes_note, должны создавать их заново
+# (notes/fts.py).
+# Индекс присоединяется к notes_note один раз: MATCH выполняется
+# один раз на запрос, а bm25() берётся из той же строки индекса.
+FTS_TABLE = 'notes_note_fts'
+JOIN_WHERE = (
+    f'{FTS_TABLE}.rowid = notes_note.id',
+    f'{FTS_TABLE} MATCH %s',
+)
+RANK_SQL = f'bm25({FTS_TABLE}, 0.0, 10.0, 1.0)'
+
+
+def owner_token(author_id):
+    return f'u{author_id}'
+
+
+def build_match(author_id, query):
+    """
+    Запрос FTS5 по заметкам одного автора: все слова обязательны.
+
+    Автор записан в индекс отдельной колонкой owner, поэтому выборка
+    ограничивается его заметками внутри самого индекса.
+    """
+    tokens = TOKEN.findall(query.lower())
+    if not tokens:
+        return None
+    words = ' '.join(f'"{token}"' for token in tokens)
+    return f'owner:"{owner_token(author_id)}" AND ({words})'
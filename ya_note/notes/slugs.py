@@ -0,0 +1,23 @@
+from functools import lru_cache
+
+from django.conf import settings
+from pytils.translit import slugify
+
+
+@lru_cache(maxsize=settings.NOTES_SLUGIFY_CACHE_SIZE)
+def cached_slugify(title):
+    """pytils slugify с LRU-кэшем: заголовки часто повторяются."""
+    return slugify(title)
+
+
+def slugify_cache_stats():
+    """Размер и доля попаданий кэша транслитерации в текущем процессе."""
+    info = cached_slugify.cache_info()
+    calls = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_rate': info.hits / calls if calls else 0.0,
+    }
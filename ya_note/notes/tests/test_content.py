@@ -1,10 +1,14 @@
-from django.test import Client, TestCase
+from http import HTTPStatus
+
+import pytest
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from .test_logic import AUTHOR, SLUG, TEXT, TITLE, USER
-from notes.models import Note, User
+from .test_logic import AUTHOR, SLUG, TEXT, TITLE, USER, VIEW_MAX_MS
+from notes.models import Note, Tag, User
 
 
+@pytest.mark.max_ms(VIEW_MAX_MS)
 class TestDetailNote(TestCase):
 
     @classmethod
@@ -26,6 +30,7 @@ class TestDetailNote(TestCase):
         cls.add_url = reverse('notes:add')
         cls.list_url = reverse('notes:list')
 
+    @pytest.mark.max_queries(10)
     def test_authorized_client_has_add_and_edit_forms(self):
         """На страницы создания и редактирования заметки передаются формы."""
         for name, args in (
@@ -37,6 +42,7 @@ class TestDetailNote(TestCase):
                 response = self.author_client.get(url)
                 self.assertIn('form', response.context)
 
+    @pytest.mark.max_queries(8)
     def test_note_not_in_list_for_another_user(self):
         """
         В список заметок одного пользователя не попадают
@@ -48,6 +54,7 @@ class TestDetailNote(TestCase):
         object_list = response.context['object_list']
         self.assertNotIn(self.note, object_list)
 
+    @pytest.mark.max_queries(10)
     def test_authorized_client_can_see_note(self):
         """
         Отдельная заметка передаётся на страницу со списком заметок
@@ -57,3 +64,123 @@ class TestDetailNote(TestCase):
         response = self.author_client.get(self.list_url)
         object_list = response.context['object_list']
         self.assertEqual(object_list[0], self.note)
+
+    @pytest.mark.max_queries(24)
+    def test_note_not_modified(self):
+        """
+        Неизменённая заметка отдаётся ответом 304 без рендеринга
+
+        и по ETag, и по Last-Modified; правка меняет ETag.
+        """
+        response = self.author_client.get(self.detail_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        for header, value in (
+            ('HTTP_IF_NONE_MATCH', etag),
+            ('HTTP_IF_MODIFIED_SINCE', last_modified),
+        ):
+            with self.subTest(header=header):
+                response = self.author_client.get(
+                    self.detail_url, **{header: value}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.templates)
+        self.note.text = 'Новый текст'
+        self.note.save()
+        response = self.author_client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @pytest.mark.max_queries(30)
+    def test_notes_list_not_modified(self):
+        """
+        У каждого пользователя свой ETag списка заметок,
+
+        и он меняется, даже если число заметок осталось прежним.
+        """
+        etag = self.author_client.get(self.list_url)['ETag']
+        response = self.author_client.get(
+            self.list_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.user_client.get(
+            self.list_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        Note.objects.create(title=TITLE, text=TEXT, author=self.author)
+        self.note.delete()
+        response = self.author_client.get(
+            self.list_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@pytest.mark.max_ms(VIEW_MAX_MS)
+class TestNotesListSearch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.user = User.objects.create(username=USER)
+        cls.list_url = reverse('notes:list')
+        cls.tag = Tag.objects.create(name='дом')
+        Note.objects.bulk_create_with_slugs(
+            Note(title=f'{TITLE} {index}', text=TEXT, author=cls.author)
+            for index in range(5)
+        )
+        cls.notes = list(Note.objects.order_by('id'))
+        cls.notes[0].tags.add(cls.tag)
+        cls.milk = Note.objects.create(
+            title='Купить молоко', text='Молоко и хлеб', author=cls.author
+        )
+        Note.objects.create(
+            title='Купить молоко', text='Молоко', author=cls.user
+        )
+
+    def get_object_list(self, **params):
+        response = self.author_client.get(self.list_url, params)
+        return list(response.context['object_list'])
+
+    @pytest.mark.max_queries(20)
+    def test_search_only_own_notes(self):
+        """Поиск находит заметки только текущего пользователя."""
+        self.assertEqual(self.get_object_list(q='МОЛОКО'), [self.milk])
+        self.assertEqual(self.get_object_list(q='молоко хлеб'), [self.milk])
+        self.assertEqual(self.get_object_list(q='молоко сыр'), [])
+
+    @pytest.mark.max_queries(14)
+    def test_search_ranked_by_relevance(self):
+        """Заметки с совпадением в заголовке идут выше."""
+        best = Note.objects.create(
+            title='Хлеб', text='Ржаной', author=self.author
+        )
+        self.assertEqual(self.get_object_list(q='хлеб'), [best, self.milk])
+
+    @pytest.mark.max_queries(10)
+    def test_filter_by_tag(self):
+        """Отбор заметок по тегу."""
+        self.assertEqual(self.get_object_list(tag='дом'), [self.notes[0]])
+
+    @override_settings(NOTES_COUNT_ON_PAGE=2)
+    @pytest.mark.max_queries(10)
+    def test_notes_list_paginated(self):
+        """Список заметок разбит на страницы."""
+        response = self.author_client.get(self.list_url, {'page': 2})
+        self.assertEqual(response.context['paginator'].count, 6)
+        self.assertEqual(
+            list(response.context['object_list']), self.notes[2:4]
+        )
+
+    @pytest.mark.max_queries(18)
+    def test_note_form_saves_tags(self):
+        """Теги из формы создаются и привязываются к заметке."""
+        self.author_client.post(reverse('notes:add'), data={
+            'title': 'Отпуск', 'text': TEXT, 'tag_names': 'Дом, море, дом',
+        })
+        note = Note.objects.get(title='Отпуск')
+        self.assertEqual(
+            sorted(note.tags.values_list('name', flat=True)), ['дом', 'море']
+        )
+        self.assertEqual(Tag.objects.count(), 2)
@@ -1,11 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from pytils.translit import slugify
 
 from notes.forms import WARNING
 from notes.models import Note, User
+from notes.slugs import cached_slugify, slugify_cache_stats
+from yanote.sqlite import set_sqlite_pragmas
 
 
 TEXT = 'Первоначальный текст'
@@ -13,6 +26,8 @@ TITLE = 'Заголовок'
 SLUG = 'slug'
 AUTHOR = 'Автор'
 USER = 'Пользователь'
+# Бюджет времени на тест представления, см. маркер max_ms.
+VIEW_MAX_MS = 500
 
 
 class TestNoteCreation(TestCase):
@@ -59,6 +74,43 @@ class TestNoteCreation(TestCase):
         expected_slug = slugify(self.form_data['title'])
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_empty_slug_with_taken_title(self):
+        """Для повторяющегося заголовка подбирается slug с суффиксом."""
+        self.form_data.pop('slug')
+        for _ in range(3):
+            self.user_client.post(self.add_url, data=self.form_data)
+        base = slugify(TITLE)
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {base, f'{base}-2', f'{base}-3'}
+        )
+
+    def test_slugify_cached(self):
+        """Повторная транслитерация заголовка берётся из кэша."""
+        cached_slugify.cache_clear()
+        for _ in range(3):
+            Note.objects.create(title=TITLE, text=TEXT, author=self.user)
+        stats = slugify_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        self.assertEqual(cached_slugify(TITLE), slugify(TITLE))
+
+    def test_bulk_create_with_slugs(self):
+        """При массовом создании заметки получают уникальные slug."""
+        Note.objects.create(title=TITLE, text=TEXT, author=self.user)
+        notes = [
+            Note(title=TITLE, text=TEXT, author=self.user) for _ in range(5)
+        ]
+        notes.append(
+            Note(title=TITLE, text=TEXT, author=self.user, slug=SLUG)
+        )
+        # На пачку: выборка занятых slug, вставка и точка сохранения.
+        with self.assertNumQueries(8):
+            Note.objects.bulk_create_with_slugs(notes, batch_size=3)
+        slugs = list(Note.objects.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), 7)
+        self.assertEqual(len(set(slugs)), 7)
+        self.assertIn(SLUG, slugs)
+
 
 class TestNoteEditDelete(TestCase):
 
@@ -100,7 +152,7 @@ class TestNoteEditDelete(TestCase):
         """Пользователь не может удалять чужие заметки."""
         notes_count = Note.objects.count()
         response = self.user_client.delete(self.delete_url)
-        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
         notes_count_after = Note.objects.count()
         self.assertEqual(notes_count, notes_count_after)
 
@@ -114,7 +166,7 @@ class TestNoteEditDelete(TestCase):
     def test_other_user_cant_edit_note(self):
         """Пользователь не может редактировать чужие заметки."""
         response = self.user_client.post(self.edit_url, data=self.form_data)
-        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
         self.note.refresh_from_db()
         self.assertEqual(self.note.text, TEXT)
 
@@ -129,3 +181,135 @@ class TestNoteEditDelete(TestCase):
         )
         notes_count = Note.objects.count()
         self.assertEqual(notes_count, 1)
+
+
+class TestImportExport(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR)
+
+    def test_import_export_round_trip(self):
+        """Выгруженные заметки загружаются обратно с новыми slug."""
+        rows = [
+            {'title': f'{TITLE} {index}', 'text': TEXT, 'author': AUTHOR}
+            for index in range(5)
+        ] + [{'title': TITLE, 'text': TEXT, 'slug': SLUG, 'author': AUTHOR}]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'notes.jsonl'
+            path.write_text(
+                '\n'.join(json.dumps(row) for row in rows), encoding='utf-8'
+            )
+            call_command(
+                'import_notes', path, batch_size=2, stdout=StringIO()
+            )
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 6)
+        self.assertEqual(Note.objects.get(title=TITLE).slug, SLUG)
+        out = StringIO()
+        call_command('export_notes', stdout=out, stderr=StringIO())
+        exported = [json.loads(line) for line in out.getvalue().splitlines()]
+        expected = [
+            {
+                'title': note.title, 'text': note.text,
+                'slug': note.slug, 'author': AUTHOR,
+            }
+            for note in Note.objects.order_by('pk')
+        ]
+        self.assertEqual(exported, expected)
+
+    def test_seed_benchmark(self):
+        """seed_benchmark создаёт заданный объём данных."""
+        call_command(
+            'seed_benchmark', users=3, notes=4, tags=2, stdout=StringIO()
+        )
+        self.assertEqual(
+            Note.objects.filter(slug__startswith='bench-').count(), 12
+        )
+        self.assertEqual(Note.tags.through.objects.count(), 24)
+
+
+class TestSqlitePragmas(TestCase):
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_sqlite_pragmas_applied(self):
+        """PRAGMA из SQLITE_PRAGMAS выполняются для соединения."""
+        set_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone(), (1234,))
+
+
+class TestQueryPlans(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR)
+        Note.objects.bulk_create(
+            Note(title=TITLE, text=TEXT, author=cls.author, slug=f'n{index}')
+            for index in range(20)
+        )
+        Note.objects.create(
+            title=TITLE, text=TEXT, author=cls.author, slug=SLUG
+        )
+
+    def test_note_queries_use_indexes(self):
+        """
+        Запросы к заметкам из представлений NoteBase идут по индексам:
+
+        без полного просмотра таблицы и без сортировки во временном дереве.
+        """
+        self.client.force_login(self.author)
+        urls = [reverse('notes:list')] + [
+            reverse(name, args=(SLUG,))
+            for name in ('notes:detail', 'notes:edit', 'notes:delete')
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(url)
+            queries = [
+                query['sql'] for query in context.captured_queries
+                if 'FROM "notes_note"' in query['sql']
+            ]
+            self.assertTrue(queries)
+            for sql in queries:
+                with self.subTest(url=url, sql=sql):
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                        plan = ' '.join(row[-1] for row in cursor.fetchall())
+                    self.assertIn('SEARCH notes_note USING', plan)
+                    self.assertNotIn('SCAN notes_note', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_search_matches_index_once(self):
+        """Поиск обращается к индексу FTS5 один раз, а не на каждую заметку."""
+        with CaptureQueriesContext(connection) as context:
+            notes = list(Note.objects.search(self.author.id, TITLE))
+        self.assertEqual(len(notes), 21)
+        [sql] = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(sql.count('MATCH'), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertEqual(plan.count('VIRTUAL TABLE INDEX'), 1)
+        self.assertNotIn('SUBQUERY', plan)
+
+
+class TestParallelRun(SimpleTestCase):
+
+    def test_suite_runs_under_xdist(self):
+        """
+        Тесты с БД проходят в воркерах pytest-xdist, как в run_tests.sh:
+
+        у каждого воркера своя тестовая БД.
+        """
+        env = {
+            name: value for name, value in os.environ.items()
+            if not name.startswith(('PYTEST_', 'DJANGO_SETTINGS_MODULE'))
+        }
+        result = subprocess.run(
+            [sys.executable, '-m', 'pytest', '-q', '-n', '2',
+             'notes/tests/test_routes.py', '-k', 'not xdist'],
+            cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stdout[-2000:])
@@ -1,12 +1,15 @@
 from http import HTTPStatus
 
-from django.test import TestCase
+import pytest
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from .test_logic import AUTHOR, SLUG, TEXT, TITLE, USER
+from .test_logic import AUTHOR, SLUG, TEXT, TITLE, USER, VIEW_MAX_MS
 from notes.models import Note, User
+from yanote.timing import BudgetExceeded, get_template_histograms
 
 
+@pytest.mark.max_ms(VIEW_MAX_MS)
 class TestRoutes(TestCase):
 
     @classmethod
@@ -20,6 +23,7 @@ class TestRoutes(TestCase):
             slug=SLUG,
         )
 
+    @pytest.mark.max_queries(4)
     def test_pages_availability(self):
         """
         Главная страница и страницы регистрации пользователей, входа в
@@ -37,17 +41,20 @@ class TestRoutes(TestCase):
                 response = self.client.get(url)
                 self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    @pytest.mark.max_queries(69)
     def test_availability_for_detail_note_edit_and_delete(self):
         """
         Страницы отдельной заметки, удаления и редактирования заметки
 
         доступны только автору заметки. Если на эти страницы попытается
 
-        зайти другой пользователь — вернётся ошибка 404.
+        зайти другой пользователь — вернётся ошибка 403, для
+
+        несуществующей заметки — 404.
         """
         users_statuses = (
             (self.author, HTTPStatus.OK),
-            (self.reader, HTTPStatus.NOT_FOUND),
+            (self.reader, HTTPStatus.FORBIDDEN),
         )
         for user, status in users_statuses:
             self.client.force_login(user)
@@ -59,7 +66,14 @@ class TestRoutes(TestCase):
                     url = reverse(name, args=(self.note.slug,))
                     response = self.client.get(url)
                     self.assertEqual(response.status_code, status)
+                with self.subTest(user=user, name=name, slug='missing'):
+                    url = reverse(name, args=('missing',))
+                    response = self.client.get(url)
+                    self.assertEqual(
+                        response.status_code, HTTPStatus.NOT_FOUND
+                    )
 
+    @pytest.mark.max_queries(29)
     def test_pages_availability_for_auth_user(self):
         """
         Аутентифицированному пользователю доступна страница со списком
@@ -78,6 +92,7 @@ class TestRoutes(TestCase):
                 response = self.client.get(url)
                 self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    @pytest.mark.max_queries(4)
     def test_redirect_for_anonymous_client(self):
         """
         При попытке перейти на страницу списка заметок,
@@ -110,3 +125,37 @@ class TestRoutes(TestCase):
                     redirect_url = f'{login_url}?next={url}'
                     response = self.client.get(url)
                     self.assertRedirects(response, redirect_url)
+
+    @pytest.mark.max_queries(25)
+    def test_timing_headers(self):
+        """В ответ добавляются заголовки с числом запросов и временем."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:list'))
+        self.assertIn('X-DB-Queries', response)
+        self.assertIn('Server-Timing', response)
+
+    @override_settings(
+        REQUEST_BUDGETS={'notes:list': {'queries': 1}},
+        REQUEST_BUDGET_ACTION='raise',
+    )
+    def test_budget_exceeded(self):
+        """Превышение бюджета запросов приводит к ошибке в режиме raise."""
+        self.client.force_login(self.author)
+        with self.assertRaises(BudgetExceeded):
+            self.client.get(reverse('notes:list'))
+
+    @pytest.mark.max_queries(25)
+    def test_template_stats_only_in_debug(self):
+        """Время рендеринга шаблонов доступно по отладочному адресу."""
+        url = reverse('template_stats')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+        self.client.force_login(self.author)
+        self.client.get(reverse('notes:list'))
+        self.assertGreaterEqual(
+            get_template_histograms()['notes/list.html']['count'], 1
+        )
+        with override_settings(DEBUG=True):
+            response = self.client.get(url)
+        self.assertIn('notes/list.html', response.json())
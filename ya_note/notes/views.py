@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .etags import note_etag, note_last_modified, notes_list_etag
 from .forms import NoteForm
 from .models import Note
 
@@ -25,6 +31,19 @@ class NoteBase(LoginRequiredMixin):
         """Пользователь может работать только со своими заметками."""
         return self.model.objects.filter(author=self.request.user)
 
+    def get_object(self, queryset=None):
+        """
+        Заметка по slug с проверкой владельца одним запросом.
+
+        Несуществующая заметка — ошибка 404, чужая — 403.
+        """
+        note = get_object_or_404(
+            self.model, slug=self.kwargs[self.slug_url_kwarg]
+        )
+        if note.author_id != self.request.user.pk:
+            raise PermissionDenied
+        return note
+
 
 class NoteCreate(NoteBase, generic.CreateView):
     """Добавление заметки."""
@@ -32,9 +51,7 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -49,11 +66,41 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
+@method_decorator(condition(etag_func=notes_list_etag), name='get')
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """
+    Список всех заметок пользователя.
+
+    Поддерживает полнотекстовый поиск (q) и отбор по тегу (tag).
+    Если список не менялся, отдаётся ответ 304 без тела.
+    """
     template_name = 'notes/list.html'
 
+    def get_paginate_by(self, queryset):
+        return settings.NOTES_COUNT_ON_PAGE
 
+    def get_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            queryset = self.model.objects.search(self.request.user.id, query)
+        else:
+            queryset = super().get_queryset().order_by('id')
+        tag = self.request.GET.get('tag')
+        if tag:
+            queryset = queryset.filter(tags__name=tag)
+        return queryset.prefetch_related('tags')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['tag'] = self.request.GET.get('tag', '')
+        return context
+
+
+@method_decorator(
+    condition(etag_func=note_etag, last_modified_func=note_last_modified),
+    name='get',
+)
 class NoteDetail(NoteBase, generic.DetailView):
-    """Заметка подробно."""
+    """Заметка подробно; неизменённая заметка отдаётся ответом 304."""
     template_name = 'notes/detail.html'
@@ -0,0 +1,18 @@
+import os
+
+SETTINGS_PROFILES = {
+    'dev': 'yanote.settings',
+    'prod': 'yanote.settings_prod',
+}
+
+
+def settings_module():
+    """Модуль настроек для профиля из переменной окружения DJANGO_ENV."""
+    profile = os.environ.get('DJANGO_ENV', 'dev')
+    try:
+        return SETTINGS_PROFILES[profile]
+    except KeyError:
+        raise RuntimeError(
+            f'Неизвестный профиль DJANGO_ENV={profile!r}, '
+            f'доступны: {", ".join(SETTINGS_PROFILES)}.'
+        ) from None
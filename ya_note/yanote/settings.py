@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanote.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -35,7 +36,8 @@ ROOT_URLCONF = 'yanote.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yanote.timing.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -52,13 +54,21 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
+# SQLite с транзакциями BEGIN IMMEDIATE, см. yanote/sqlite_backend.
+# Тестовая БД задана явно: pytest-django оставляет в памяти БД воркеров
+# pytest-xdist только для стандартного движка sqlite3.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yanote.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': ':memory:'},
     }
 }
 
+# PRAGMA, которые выполняются для каждого нового соединения с SQLite,
+# см. yanote.sqlite.set_sqlite_pragmas. В разработке не нужны.
+SQLITE_PRAGMAS = {}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +97,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_PAGE = 50
+NOTES_SLUGIFY_CACHE_SIZE = 10_000
+
+# Бюджеты на запрос по имени URL: число SQL-запросов и время в мс.
+# При превышении RequestTimingMiddleware пишет предупреждение в лог
+# ('log') или выбрасывает BudgetExceeded ('raise').
+REQUEST_BUDGETS = {
+    'notes:list': {'queries': 6, 'ms': 300},
+    'notes:detail': {'queries': 5, 'ms': 200},
+    'notes:add': {'queries': 14, 'ms': 200},
+    'notes:edit': {'queries': 14, 'ms': 200},
+    'notes:delete': {'queries': 6, 'ms': 200},
+}
+REQUEST_BUDGET_ACTION = 'log'
+REQUEST_HISTOGRAM_SIZE = 1000
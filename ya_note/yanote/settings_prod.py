@@ -0,0 +1,46 @@
+"""
+Профиль для продакшена.
+
+Выбирается переменной окружения DJANGO_ENV=prod. Шаблоны загружаются
+кэширующим загрузчиком: файл читается и компилируется один раз на
+процесс, а не при каждом рендеринге. Соединения с БД переиспользуются
+между запросами, SQLite работает в режиме WAL.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, TEMPLATES
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': 60,
+    }
+}
+
+# WAL: читатели не блокируют писателя, и наоборот. С synchronous=NORMAL
+# в режиме WAL fsync выполняется только при checkpoint. busy_timeout
+# стоит первым: смене journal_mode тоже может понадобиться подождать.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Выполняет PRAGMA из настройки SQLITE_PRAGMAS для нового соединения.
+
+    Подключается к сигналу connection_created; соединения с другими
+    СУБД пропускаются.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,16 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite, в котором транзакции atomic() начинаются с BEGIN IMMEDIATE.
+
+    Отложенная транзакция (BEGIN) сначала берёт блокировку чтения, например
+    когда триггер FTS5 читает настройки индекса, а при переходе к записи
+    SQLite не ждёт busy_timeout и сразу возвращает SQLITE_BUSY. BEGIN
+    IMMEDIATE берёт блокировку записи в начале транзакции, и занятая БД
+    ожидается штатно.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')